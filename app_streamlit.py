@@ -12,7 +12,8 @@ if "/mnt/data" not in sys.path:
     sys.path.append("/mnt/data")
 
 import rl_helper as H
-from rl_offline_runner import run_offline   # your hardened runner
+import rl_excelconverter as XL
+from rl_offline_runner import run_offline_frame, read_order_books_parallel   # your hardened runner
 
 # ---------- Safe wrapper so missing columns won't crash ----------
 _orig_update = H.update_special_remarks_with_article_code
@@ -72,83 +73,13 @@ def _save_tmp(uploaded, name_hint):
         f.write(uploaded.getbuffer())
     return path
 
-def _canon(s: str) -> str:
-    s = "" if s is None else str(s)
-    s = s.replace("\n", " ")
-    s = " ".join(s.split())
-    return s.strip()
-
-def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    rename = {}
-    for c in list(df.columns):
-        key = _canon(c)
-        key_l = key.lower().replace(" ", "").replace("-", "_")
-        target = None
-        if key_l in {"itemid","item_id"}: target = "Item Id"
-        elif key_l in {"extitemid","ext_item_id","extitemid."}: target = "Ext Item Id"
-        elif key_l in {"skuno","sku","skunumber","sku_no","sku.number"}: target = "SKUNo"
-        elif key_l in {"articlecode","article_code"}: target = "Article code"
-        elif key_l in {"subproductcode","sub_product_code"}: target = "Sub Product Code"
-        elif key_l in {"workorderid","work_order_id"}: target = "Work Order Id"
-        elif key_l in {"wosrl","wo_srl","wo.serial","wo_srno"}: target = "WO Srl"
-        elif key_l in {"qty.1","qty1","qty_1"}: target = "Qty.1"
-        elif key_l in {"itemidstone","item_id_stone"}: target = "Item Id Stone"
-        elif key_l in {"code"}: target = "Code"
-        elif key_l in {"quality"}: target = "QUALITY"
-        elif key_l in {"kt","karat"}: target = "KT"
-        if target is None: target = key
-        rename[c] = target
-    out = df.rename(columns=rename)
-    all_nan = [c for c in out.columns if out[c].isna().all()]
-    if all_nan: out = out.drop(columns=all_nan)
-    return out
-
-_HEADER_KEYS = {
-    "item id","itemid","item_id","work order id","wo srl","article code","sub product code",
-    "ext item id","skuno","sku","trans date","qty","net qty","pure qty","diamond pieces","dia wt","quality","kt","code"
-}
-
-def _find_header_row(df_head: pd.DataFrame) -> int | None:
-    best_idx, best_hits = None, 0
-    for i in range(min(len(df_head), 25)):
-        row = df_head.iloc[i].astype(str).tolist()
-        hits = sum(1 for cell in row if (cell or "").lower().strip().replace("  "," ") in _HEADER_KEYS)
-        if hits > best_hits:
-            best_hits, best_idx = hits, i
-    return best_idx if best_hits >= 3 else None
-
-def _read_mainorder_excel_autodetect_app(path: str) -> pd.DataFrame:
-    xls = pd.ExcelFile(path, engine="openpyxl")
-    chosen = None
-    for sheet in xls.sheet_names:
-        head = pd.read_excel(xls, sheet_name=sheet, header=None, nrows=25, dtype=str)
-        hdr_idx = _find_header_row(head)
-        if hdr_idx is not None:
-            df = pd.read_excel(xls, sheet_name=sheet, header=hdr_idx, dtype=str)
-            df = _normalize_columns(df)
-            if any(k in df.columns for k in
-                   ["Item Id","Ext Item Id","Work Order Id","Article code","Sub Product Code","SKUNo","Code","QUALITY","KT"]):
-                chosen = df
-                break
-    if chosen is None:
-        df = pd.read_excel(xls, sheet_name=0, dtype=str)
-        chosen = _normalize_columns(df)
-    return chosen.dropna(how="all").reset_index(drop=True)
-
-def _drop_unknown_sheets(path: str):
-    """Remove any sheet whose name contains 'unknown' (case-insensitive, spaces ignored)."""
-    try:
-        from openpyxl import load_workbook
-        wb = load_workbook(path)
-        norm = lambda s: re.sub(r"\s+", "", (s or "")).lower()
-        targets = [n for n in wb.sheetnames if "unknown" in norm(n)]
-        if targets and (len(wb.sheetnames) - len(targets)) >= 1:
-            for n in targets:
-                wb.remove(wb[n])
-            wb.save(path)
-        return targets
-    except Exception as e:
-        return [f"<cleanup_failed: {e}>"]
+def _unknown_sheet_filter(removed: list):
+    """Sheet filter for the exporter that drops '*unknown*' sheets and records them in removed."""
+    def _filter(names):
+        kept = XL.drop_unknown_sheets(names)
+        removed.extend(n for n in dict.fromkeys(names) if n not in kept)
+        return kept
+    return _filter
 
 # ======================== RUN ========================
 if run_btn and excel_files:
@@ -169,11 +100,11 @@ if run_btn and excel_files:
 
         # step 2: reading
         status_line.info("Reading files…")
-        prog.progress(35)
-        frames = []
-        for p in tmp_paths:
-            df = _read_mainorder_excel_autodetect_app(p)
-            frames.append(df)
+        prog.progress(15)
+        def _read_progress(done, total):
+            status_line.info(f"Reading files… ({done}/{total})")
+            prog.progress(15 + int(40 * done / total))
+        frames = read_order_books_parallel(tmp_paths, on_done=_read_progress)
 
         if not frames:
             raise ValueError("No readable rows found in the uploaded files.")
@@ -183,28 +114,22 @@ if run_btn and excel_files:
         prog.progress(55)
         merged = pd.concat(frames, ignore_index=True, sort=False)
 
-        # step 4: writing merged input
-        status_line.info("Preparing export…")
-        prog.progress(70)
-        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        merged_in_path = os.path.join(_tmp_dir(), f"merged_input_{stamp}.xlsx")
-        merged.to_excel(merged_in_path, index=False)
-
-        # step 5: run conversion
+        # step 4: run conversion straight from the merged frame (no xlsx round-trip)
         status_line.info("Running converter…")
-        prog.progress(90)
-        prefix = out_prefix.strip() or None
-        out_path = run_offline(
-            merged_in_path,
+        prog.progress(80)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        prefix = out_prefix.strip() or os.path.join(_tmp_dir(), f"merged_input_{stamp}_processed")
+        removed = []
+        out_path = run_offline_frame(
+            merged,
             client_name="Reliance",
             output_prefix=prefix,
-            style_master_csv=None,
-            validator_csv=None,
+            sheet_filter=_unknown_sheet_filter(removed),
+            output_format="xlsx",   # offered as a workbook download
         )
 
-        # step 6: cleanup
+        # step 5: done ('*unknown*' sheets were never written)
         status_line.info("Finalizing…")
-        removed = _drop_unknown_sheets(out_path)
         prog.progress(100)
         status_line.success("Done.")
 
@@ -0,0 +1,167 @@
+"""
+Time and peak memory of every stage of the offline Reliance pipelines.
+
+    python -m benchmarks.bench_pipeline --rows 1000 10000 100000
+
+For each size a synthetic order book with its style master and validator is
+written (benchmarks.synthetic) and run through run_reliance_local.run_offline
+('reliance') and rl_offline_runner.run_offline ('offline'). A stage is the time
+spent in the pipeline functions listed in STAGES, wrapped for the run; calls
+made from inside another stage count towards the outer one, and whatever the
+pipeline does between stages is reported as 'other'. Peak memory is the largest
+Python allocation (tracemalloc) above what was allocated when the stage started;
+--no-memory skips tracing, which slows pandas code down, for cleaner times.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import functools
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+
+# Every run reads its book from scratch rather than from the Parquet input cache
+os.environ.setdefault('RELIANCE_INPUT_CACHE', '0')
+
+import run_reliance_local as RUNNER
+import rl_offline_runner as OFFLINE
+import rl_helper as H
+import rl_excelconverter as XL
+from benchmarks import synthetic
+
+# Pipeline -> [(module, function, stage)] in pipeline order
+STAGES = {
+    'reliance': [
+        (RUNNER, 'read_mainorder_file', 'read'),
+        (H, 'helper_reliance', 'helper_reliance'),
+        (H, 'decode_item_id', 'derive'),
+        (H, 'stamping_instruct', 'stamping'),
+        (H, 'fill_missing_style_code', 'style check'),
+        (H, 'check_style_master', 'style check'),
+        (H, 'map_and_add_category_column', 'style check'),
+        (H, 'process_special_remarks', 'remarks'),
+        (H, 'update_special_remarks_with_article_code', 'remarks'),
+        (H, 'validate_order', 'validate'),
+        (H, 'adjust_production_delivery_date', 'dates'),
+        (XL, 'process_and_export', 'export'),
+    ],
+    'offline': [
+        (OFFLINE, '_read_mainorder_excel_autodetect', 'read'),
+        (OFFLINE, 'normalize_columns', 'normalize'),
+        (H, 'decode_item_id', 'derive'),
+        (H, 'stamping_instruct', 'stamping'),
+        (OFFLINE, 'mirror_special_remarks', 'remarks'),
+        (OFFLINE, 'ensure_global_special_remarks', 'remarks'),
+        (H, 'adjust_production_delivery_date', 'dates'),
+        (XL, 'process_and_export', 'export'),
+    ],
+}
+
+
+class StageTimer:
+    """Accumulates wall time, calls and peak traced memory per stage of one run."""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.peak = 0
+        self._depth = 0
+
+    def wrap(self, stage, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            if self._depth:
+                return fn(*args, **kwargs)
+            self._depth += 1
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                self.peak = max(self.peak, peak)
+                tracemalloc.reset_peak()
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record = self.stages.setdefault(stage, {'seconds': 0.0, 'calls': 0, 'peak_mb': 0.0})
+                record['seconds'] += time.perf_counter() - started
+                record['calls'] += 1
+                if self.trace_memory:
+                    peak = tracemalloc.get_traced_memory()[1]
+                    self.peak = max(self.peak, peak)
+                    record['peak_mb'] = max(record['peak_mb'], (peak - current) / 2 ** 20)
+                self._depth -= 1
+        return timed
+
+    @contextmanager
+    def patched(self, targets):
+        originals = [(module, name, getattr(module, name)) for module, name, _ in targets]
+        try:
+            for module, name, stage in targets:
+                setattr(module, name, self.wrap(stage, getattr(module, name)))
+            yield self
+        finally:
+            for module, name, original in originals:
+                setattr(module, name, original)
+
+
+def run_pipeline(pipeline, inputs, out_dir):
+    prefix = os.path.join(out_dir, f'{pipeline}_processed')
+    if pipeline == 'reliance':
+        return RUNNER.run_offline(inputs['order_book'], 'Reliance', prefix,
+                                  style_master_csv=inputs['style_master'], validator_csv=inputs['validator'])
+    return OFFLINE.run_offline(inputs['order_book'], 'Reliance', prefix)
+
+
+def measure(pipeline, rows, inputs, out_dir, trace_memory=True):
+    timer = StageTimer(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with timer.patched(STAGES[pipeline]), open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            run_pipeline(pipeline, inputs, out_dir)
+        seconds = time.perf_counter() - started
+        if trace_memory:
+            timer.peak = max(timer.peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    stages = {stage: {**record, 'seconds': round(record['seconds'], 3),
+                      'peak_mb': round(record['peak_mb'], 1) if trace_memory else None}
+              for stage, record in timer.stages.items()}
+    other = seconds - sum(record['seconds'] for record in timer.stages.values())
+    stages['other'] = {'seconds': round(other, 3), 'calls': 0, 'peak_mb': None}
+    return {'pipeline': pipeline, 'rows': rows, 'seconds': round(seconds, 3),
+            'peak_mb': round(timer.peak / 2 ** 20, 1) if trace_memory else None, 'stages': stages}
+
+
+def report(result):
+    peak = f"peak {result['peak_mb']:>8.1f} MB" if result['peak_mb'] is not None else ''
+    print(f"{result['pipeline']:<9} {result['rows']:>8} rows  {result['seconds']:>8.2f}s  {peak}", flush=True)
+    for stage, record in result['stages'].items():
+        stage_peak = f"peak {record['peak_mb']:>8.1f} MB" if record['peak_mb'] is not None else ''
+        print(f"    {stage:<16} {record['seconds']:>8.3f}s  {stage_peak}", flush=True)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Benchmark the stages of the offline Reliance pipelines.')
+    p.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    p.add_argument('--pipelines', nargs='+', default=list(STAGES), choices=list(STAGES))
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--no-memory', action='store_true', help='Do not trace allocations (times only)')
+    args = p.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for rows in args.rows:
+            inputs = synthetic.write_inputs(rows, out_dir, args.seed)
+            for pipeline in args.pipelines:
+                result = measure(pipeline, rows, inputs, out_dir, trace_memory=not args.no_memory)
+                results.append(result)
+                report(result)
+    return results
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,72 @@
+"""
+Peak memory and time of the xlsx export backends as the output grows.
+
+    python -m benchmarks.bench_xlsx_export --rows 10000 50000 100000
+
+Each run writes one order-book-shaped frame split over a few sheets and reports the
+peak Python allocation during the write (tracemalloc), the wall time and the file size.
+The 'xlsx' backend grows with the row count; 'xlsx-stream' should stay flat.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+import run_reliance_local  # noqa: F401  installs the Clients.reliance alias rl_excelconverter imports
+import rl_excelconverter as XL
+from rl_mapping import reliance_required_columns
+
+SHEETS = 4
+
+
+def make_sheets(rows, seed=0):
+    """{sheet name: frame} with the export columns, strings and numbers mixed as in real output."""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        column: (rng.integers(1, 5, rows) if column in ('OrderQty', 'OrderItemPcs')
+                 else pd.Series(rng.integers(0, 10 ** 6, rows)).astype(str).radd(f'{column[:3]}-'))
+        for column in reliance_required_columns
+    })
+    bounds = np.linspace(0, rows, SHEETS + 1).astype(int)
+    return {f'SHEET {i} 18KT-{bounds[i + 1] - bounds[i]} PCS': frame.iloc[bounds[i]:bounds[i + 1]]
+            for i in range(SHEETS)}
+
+
+def measure(output_format, rows, out_dir):
+    sheets = make_sheets(rows)
+    prefix = os.path.join(out_dir, f'bench_{output_format}_{rows}')
+    tracemalloc.start()
+    started = time.perf_counter()
+    path = XL.OUTPUT_BACKENDS[output_format](prefix, sheets)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = os.path.getsize(path)
+    os.remove(path)
+    return {'format': output_format, 'rows': rows, 'seconds': round(seconds, 2),
+            'peak_mb': round(peak / 2 ** 20, 1), 'size_mb': round(size / 2 ** 20, 1)}
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Benchmark the xlsx export backends.')
+    p.add_argument('--rows', type=int, nargs='+', default=[10000, 50000, 100000])
+    p.add_argument('--formats', nargs='+', default=['xlsx', 'xlsx-stream'], choices=list(XL.OUTPUT_BACKENDS))
+    args = p.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for rows in args.rows:
+            for output_format in args.formats:
+                result = measure(output_format, rows, out_dir)
+                results.append(result)
+                print(f"{result['format']:<12} {result['rows']:>8} rows  {result['seconds']:>7.2f}s  "
+                      f"peak {result['peak_mb']:>8.1f} MB  file {result['size_mb']:>6.1f} MB", flush=True)
+    return results
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
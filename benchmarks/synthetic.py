@@ -0,0 +1,250 @@
+"""
+Deterministic synthetic Reliance order books for the benchmarks.
+
+    python -m benchmarks.synthetic --rows 10000 --out-dir /tmp/orders
+
+An order book has the layout of the vendor work order export: the first row of
+each WO Srl carries the item (Item Id, Ext Item Id, Article code, ...) and one
+stone, the following rows of the same WO Srl only carry further stones, the
+stone weight sits under a second 'Qty' header (read back as 'Qty.1') and the
+sheet ends with a 4-row footer. Item Ids are built from the rl_mapping tables so
+every position the pipeline decodes is valid; SET lines carry '+' and '&' Ext
+Item Ids. The style master and validator are derived from the same book, so
+part of the lines match them and part do not.
+"""
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+import rl_mapping as M
+
+# Columns of the generated export; 'Stone Qty' is written under a second 'Qty' header
+COLUMNS = [
+    'Work Order Id', 'WO Srl', 'Trans Date', 'Item Id', 'SKU Number', 'Ext Item Id', 'Article code',
+    'Sub Product Code', 'Complexity code', 'Plating Type', 'Qty', 'Net Qty', 'Pure Qty', 'Item Id Stone',
+    'Code', 'Size Id', 'Setting Code', 'Pds CW Qty', 'Stone Qty', 'CRate', 'Special Remarks', 'Reference Type',
+    'Intended Warehouse', 'Indent Name', 'Min Wt', 'Max Wt', 'Target Date', 'SizeID',
+]
+
+# Article code -> (share of lines, Item Id[11:13] codes its lines are sized with)
+ARTICLES = {
+    'RNG': (0.30, list(M.rng_mapping)),
+    'ERG': (0.15, list(M.order_group_mapping)),
+    'PDC': (0.12, list(M.msr_mapping)),
+    'BRC': (0.06, list(M.brc_mapping)),
+    'BAN': (0.04, list(M.brc_mapping)),
+    'BNG': (0.05, list(M.bng_mapping)),
+    'MSR': (0.04, list(M.msr_mapping)),
+    'NLS': (0.08, ['A1', 'B1']),
+    'NSP': (0.04, ['A1', 'A2']),
+    'SET': (0.12, ['A1', 'B1', 'B2']),
+}
+
+SUB_PRODUCT_CODES = ['LDS', 'GNT', 'PDC', 'STD']
+SET_SUB_PRODUCT_CODES = ['NECKLACE SET', 'EARRING SET', 'LDS']
+STONES = ['DRD-IGI', 'DRD-IGI', 'DRD-IGI', 'CLR-STN', 'PRL']
+STONE_CODES = ['RD-VVS-GH', 'RD-VVS-EF', 'RD-VS-GH', 'RD-SI-GH', 'RD-SI-JK']
+SIZE_IDS = ['(+0-2)', '(+2-6.5)', '(+6.5-11)', '(+11-14)']
+ERG_SIZE_CODES = ['70', '72', '75', '71', '76', '12']
+MAIN_GROUPS = ['RING', 'EARRING', 'NECKLACE', 'BANGLE', 'PENDANT']
+
+# Stones per WO Srl are drawn from 1..MAX_STONES
+MAX_STONES = 6
+
+# Rows at the bottom of every export that are not order lines (dropped by helper_reliance)
+FOOTER_ROWS = 4
+
+
+def _choice(rng, values, size, p=None):
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=p)]
+
+
+def _numbers(rng, low, high, size, decimals=3):
+    return np.round(rng.uniform(low, high, size), decimals)
+
+
+def _item_ids(rng, articles):
+    # Fixed-width code: metal [0], order group [11:13], size [13:15], tone [15], stamping [16:18]
+    n = len(articles)
+    order_group = np.empty(n, dtype=object)
+    for article, (_, codes) in ARTICLES.items():
+        rows = np.flatnonzero(articles == article)
+        order_group[rows] = _choice(rng, codes, len(rows))
+    size = np.where(articles == 'ERG', _choice(rng, ERG_SIZE_CODES, n), '00').astype(object)
+    filler = pd.Series(rng.integers(0, 10 ** 6, n)).map('{:06d}'.format).to_numpy(dtype=object)
+    return (_choice(rng, list(M.mapping_for_quality), n) + 'D' + articles + filler + order_group + size
+            + _choice(rng, list(M.tone_mapping), n) + _choice(rng, list(M.stamping_mapping), n))
+
+
+def _ext_item_ids(rng, articles, styles):
+    # Design numbers; SET lines join two designs with '+' or '&', a few lines have none
+    n = len(articles)
+    first, second = _choice(rng, styles, n), _choice(rng, styles, n)
+    ext = first.copy()
+    is_set = articles == 'SET'
+    joiner = np.where(rng.random(n) < 0.5, '+', ' & ').astype(object)
+    ext[is_set] = first[is_set] + joiner[is_set] + second[is_set]
+    ext[~is_set & (rng.random(n) < 0.03)] = None
+    return ext
+
+
+def order_book(rows, seed=0, styles=None):
+    """
+    DataFrame of `rows` order-book rows (footer not included) with the COLUMNS columns.
+
+    :param rows: Number of sheet rows, stone continuation rows included
+    :param seed: Same seed, same book
+    :param styles: Size of the design number pool (defaults to one design per 8 lines)
+    """
+    rng = np.random.default_rng(seed)
+
+    # Stones per WO Srl, cut so the book has exactly `rows` rows
+    stones = rng.integers(1, MAX_STONES + 1, rows)
+    ends = np.cumsum(stones)
+    lines = int(np.searchsorted(ends, rows)) + 1
+    stones = stones[:lines]
+    stones[-1] -= ends[lines - 1] - rows
+
+    styles = np.array([f'W-LRB{i:05d}' for i in range(styles or max(lines // 8, 1))], dtype=object)
+    shares = np.array([share for share, _ in ARTICLES.values()])
+    articles = _choice(rng, list(ARTICLES), lines, p=shares / shares.sum())
+    is_set = articles == 'SET'
+    gross = _numbers(rng, 1, 12, lines)
+
+    item = pd.DataFrame({
+        'Work Order Id': 'JO250004932',
+        'WO Srl': np.arange(1, lines + 1),
+        'Trans Date': '24/09/2025',
+        'Item Id': _item_ids(rng, articles),
+        'SKU Number': pd.Series(rng.integers(10 ** 7, 10 ** 8, lines)).map('SKU{}'.format).to_numpy(dtype=object),
+        'Ext Item Id': _ext_item_ids(rng, articles, styles),
+        'Article code': articles,
+        'Sub Product Code': np.where(is_set, _choice(rng, SET_SUB_PRODUCT_CODES, lines),
+                                     _choice(rng, SUB_PRODUCT_CODES, lines)),
+        'Complexity code': _choice(rng, ['XXD-F', 'XXD-R', 'XD-F'], lines),
+        'Plating Type': 'BAT',
+        'Qty': gross,
+        'Net Qty': np.round(gross * 0.98, 3),
+        'Pure Qty': np.round(gross * 0.75, 3),
+        'Special Remarks': pd.Series(rng.integers(10 ** 5, 10 ** 6, lines)).map('TR70D{}DSI'.format)
+                             .to_numpy(dtype=object),
+        'Reference Type': 'Regular Order',
+        'Intended Warehouse': _choice(rng, ['8405', 'TAST', 'TR70'], lines),
+        'Indent Name': _choice(rng, ['Diamond_Model Stock_W4_DSI_Sept25', 'Diamond_Replenishment_W2'], lines),
+        'Min Wt': np.round(gross * 0.85, 4),
+        'Max Wt': np.round(gross * 1.15, 4),
+        'Target Date': _choice(rng, ['08/11/2025', '15/11/2025', '22/11/2025'], lines),
+        'SizeID': _choice(rng, ['16 MM', '17 MM', '19 MM', '2.4 OPN', '18 INCH'], lines),
+    })
+
+    # One row per stone; only the first row of a WO Srl carries the item
+    line = np.repeat(np.arange(lines), stones)
+    first = np.r_[True, line[1:] != line[:-1]]
+    book = item.iloc[line].reset_index(drop=True)
+    item_columns = [c for c in item.columns if c not in ('Work Order Id', 'WO Srl', 'Reference Type')]
+    book.loc[~first, item_columns] = None
+    book.loc[~first, ['Qty', 'Net Qty', 'Pure Qty']] = 0
+
+    book['Item Id Stone'] = _choice(rng, STONES, rows)
+    book['Code'] = _choice(rng, STONE_CODES, rows)
+    book['Size Id'] = _choice(rng, SIZE_IDS, rows)
+    book['Setting Code'] = _choice(rng, ['PAV', 'PRG', 'BZL'], rows)
+    book['Pds CW Qty'] = rng.integers(1, 40, rows)
+    book['Stone Qty'] = _numbers(rng, 0.005, 0.5, rows)
+    book['CRate'] = _choice(rng, [35000, 37250, 48500], rows)
+    return book[COLUMNS]
+
+
+def style_master(book, seed=0):
+    """
+    Style master (PartyStyleMst projection) for the designs of book.
+
+    About 90% of the designs are listed; the diamond weight and pieces of a design
+    are those of its first line, off by 10% for one design in five, so the
+    validation finds both matching and mismatching lines.
+    """
+    rng = np.random.default_rng(seed + 1)
+    lines = book[book['Item Id'].notna() & book['Ext Item Id'].notna()]
+    lines = lines[~lines['Ext Item Id'].str.contains(r'\+|&')]
+    diamonds = book[book['Item Id Stone'] == 'DRD-IGI'].groupby('WO Srl')[['Stone Qty', 'Pds CW Qty']].sum()
+    firsts = lines.drop_duplicates('Ext Item Id')
+    firsts = firsts[rng.random(len(firsts)) < 0.9]
+    totals = diamonds.reindex(firsts['WO Srl']).fillna(0).to_numpy()
+    off = np.where(rng.random(len(firsts)) < 0.2, 1.1, 1.0)
+
+    party = firsts['Item Id'].str[-2:].map(M.last_two_digit_mapping)
+    return pd.DataFrame({
+        'StyleCode': firsts['Ext Item Id'].to_numpy(),
+        'PartyName': ('Reliance Retail Ltd ' + party).to_numpy(),
+        'MainGroupPrdctCtg': _choice(rng, MAIN_GROUPS, len(firsts)),
+        'SubGroupPrdctCtg': _choice(rng, M.valid_product_categories + ['DISCONTINUED'], len(firsts)),
+        'Client Style No': firsts['Ext Item Id'].to_numpy(),
+        'DiamondWt': np.round(totals[:, 0] * off, 3),
+        'DiamondPcs': np.round(totals[:, 1] * off).astype(int),
+    })
+
+
+def validator(book, seed=0):
+    """RRLDsgCd -> AuraDsgCd mapping covering the lines that have no Ext Item Id."""
+    rng = np.random.default_rng(seed + 2)
+    missing = book.loc[book['Item Id'].notna() & book['Ext Item Id'].isna(), 'Item Id'].drop_duplicates()
+    return pd.DataFrame({
+        'RRLDsgCd': missing.to_numpy(),
+        'AuraDsgCd': pd.Series(rng.integers(0, 10 ** 5, len(missing))).map('W-AUR{:05d}'.format).to_numpy(),
+    })
+
+
+def write_order_book(book, path):
+    """Write book as an export workbook (header on the first row, footer at the end)."""
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        sheet = workbook.add_worksheet('Sheet1')
+        sheet.write_row(0, 0, ['Qty' if c == 'Stone Qty' else c for c in COLUMNS])
+        columns = [book[c].astype(object).where(book[c].notna(), None).tolist() for c in book.columns]
+        for r, values in enumerate(zip(*columns), start=1):
+            for c, value in enumerate(values):
+                if value is not None:
+                    sheet.write(r, c, value)
+        # Two empty rows, the weight subtotal and the TOTAL row, as the export ends
+        last = len(book) + FOOTER_ROWS
+        sheet.write_row(last - 1, COLUMNS.index('Pds CW Qty'), [0, round(float(book['Stone Qty'].sum()), 3)])
+        sheet.write_row(last, 0, ['TOTAL', 0, 0, round(float(book['Qty'].sum()), 3)])
+    finally:
+        workbook.close()
+    return path
+
+
+def write_inputs(rows, out_dir, seed=0):
+    """
+    Write an order book of `rows` rows with its style master and validator CSVs
+    to out_dir; returns {'order_book': path, 'style_master': path, 'validator': path}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    book = order_book(rows, seed)
+    paths = {
+        'order_book': os.path.join(out_dir, f'orders_{rows}.xlsx'),
+        'style_master': os.path.join(out_dir, f'style_master_{rows}.csv'),
+        'validator': os.path.join(out_dir, f'validator_{rows}.csv'),
+    }
+    write_order_book(book, paths['order_book'])
+    style_master(book, seed).to_csv(paths['style_master'], index=False)
+    validator(book, seed).to_csv(paths['validator'], index=False)
+    return paths
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Write synthetic Reliance order books.')
+    p.add_argument('--rows', type=int, nargs='+', default=[1000])
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--out-dir', default='.')
+    args = p.parse_args(argv)
+    for rows in args.rows:
+        print(write_inputs(rows, args.out_dir, args.seed))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,36 +1,13 @@
-import os
 import pandas as pd
-import pymssql
+from rl_db import get_pool, read_frame
 
  
-def fetch_client_data(client_name):
-    # Database credentials (must be loaded from environment variables)
-    server = os.environ.get('AURA_DB_SERVER')
-    database = os.environ.get("AURA_DB_NAME")
-    username = os.environ.get("AURA_DB_USER")
-    password = os.environ.get("AURA_DB_PASSWORD")
-
-    # Check for missing environment variables
-    missing_vars = []
-    if not server:
-        missing_vars.append('AURA_DB_SERVER')
-    if not database:
-        missing_vars.append('AURA_DB_NAME')
-    if not username:
-        missing_vars.append('AURA_DB_USER')
-    if not password:
-        missing_vars.append('AURA_DB_PASSWORD')
-    if missing_vars:
-        raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
-
-    # Establish the connection to the SQL Server using pymssql
-    try:
-        conn = pymssql.connect(server=server, user=username, password=password, database=database)
-        
-        # Create a cursor object
-        cursor = conn.cursor()
-        
-        query = f"""Select 
+def _style_master_query(extra_filter=''):
+    """
+    PartyStyleMst projection; the client name pattern is the first %s parameter and
+    extra_filter (with its own %s parameters) is appended to the inner Where.
+    """
+    return f"""Select 
                 IsNull(IsComplete , '') As IsComplete , IsNull(StyleId , '') As StyleId , IsNull(SKUNo , '') As SKUNo 
                 , IsNull(ImageName , '') As ImageName , IsNull(ImageExt , '') As ImageExt
                 , IsNull(GrpGroupName , '') As MainGroupPrdctCtg, IsNull(GrpName , '') As SubGroupPrdctCtg, IsNull(StyleCode , '') As StyleCode , IsNull(StyleDate , '') As StyleDate
@@ -76,33 +53,73 @@ def fetch_client_data(client_name):
                 Inner Join [AURESJEP].[dbo].MainProduct_View mp With (Nolock) on sm.GrpNo=mp.GrpNo 
                 Inner Join [AURESJEP].[dbo].PartyMst pm With (Nolock) on pm.PartyNo=sm.CustomerId 
                 Where sm.StyleId <> '' 
-                And (Case When pm.LegalName <> '' Then  pm.LegalName Else pm.FirmName End) Like '%{client_name}%'
+                And (Case When pm.LegalName <> '' Then  pm.LegalName Else pm.FirmName End) Like %s
+                {extra_filter}
                 ) An 
                 Where StyleId <> '' 
                 Order By LegalName , GrpName , SKUNo"""
 
-        df = pd.read_sql(query, conn)
+
+def _client_pattern(client_name):
+    return f"%{client_name}%"
+
+
+def _empty_result(client_name):
+    # Same shape as the successful result so callers can always unpack it
+    if client_name == 'Titan':
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    return pd.DataFrame(), pd.DataFrame()
+
+
+def fetch_client_data(client_name, chunksize=None):
+    pool = get_pool()
+    try:
+        df = read_frame(_style_master_query(), (_client_pattern(client_name),), chunksize=chunksize, pool=pool)
 
         if client_name == 'Titan':
             query1 = """Select * From [AuraDb].[dbo].[Tbl_GCMaxDsgList] Order By DsgId"""
             query2 = """Select * From [AuraDb].[dbo].[Tbl_NoosBufferBif] Order By [Bifurcation]"""
 
-            # Fetch the data into DataFrames using pandas' read_sql function
-            gcmax = pd.read_sql(query1, conn)
+            # Fetch the data into DataFrames
+            gcmax = read_frame(query1, pool=pool)
             gcmax.rename(columns={"OldSkuNo": "Sku"}, inplace=True)
-            noosebuffer = pd.read_sql(query2, conn)
+            noosebuffer = read_frame(query2, pool=pool)
             
             return df, gcmax, noosebuffer
         elif client_name == 'Reliance':
             
             query1 = """Select * From [AuraDb].[dbo].[Tbl_RRLDsgCdMst] Order By RRLDsgCd , [AuraDsgCd]"""
-            validator_df = pd.read_sql(query1, conn)
+            validator_df = read_frame(query1, pool=pool)
             return df, validator_df
 
-    except pymssql.Error as e:
+    except pool.driver.error as e:
         print(f"An error occurred while executing the query for client {client_name}: {e}")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return _empty_result(client_name)
+
+
+def fetch_style_master_delta(client_name, since_date=None, since_id=None):
+    """
+    Fetch only the style master rows created after the last-synced watermark,
+    i.e. rows whose StyleDate or StyleId is past (since_date, since_id).
+    """
+    conditions, params = [], [_client_pattern(client_name)]
+    if since_date is not None:
+        conditions.append("sm.StyleDate > %s")
+        params.append(since_date)
+    if since_id is not None:
+        conditions.append("sm.StyleId > %s")
+        params.append(since_id)
+    extra_filter = f"And ({' Or '.join(conditions)})" if conditions else ''
+
+    return read_frame(_style_master_query(extra_filter), params)
+
+
+def fetch_style_ids(client_name):
+    """Fetch the StyleIds that currently exist for client_name, used to reconcile deletions."""
+    query = """Select sm.StyleId
+                From [AURESJEP].[dbo].PartyStyleMst sm With (Nolock)
+                Inner Join [AURESJEP].[dbo].PartyMst pm With (Nolock) on pm.PartyNo=sm.CustomerId
+                Where sm.StyleId <> ''
+                And (Case When pm.LegalName <> '' Then  pm.LegalName Else pm.FirmName End) Like %s"""
 
-    finally:
-        # Ensure the connection is closed
-        conn.close()
+    return read_frame(query, (_client_pattern(client_name),))['StyleId']
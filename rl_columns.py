@@ -0,0 +1,79 @@
+from functools import lru_cache
+import pandas as pd
+
+# Canonical order-book column -> header spellings seen in Reliance exports
+# (compared lower-cased, without spaces, with '-' read as '_')
+COLUMN_ALIASES = {
+    'Item Id': {'itemid', 'item_id'},
+    'Ext Item Id': {'extitemid', 'ext_item_id', 'extitemid.'},
+    'SKUNo': {'skuno', 'sku', 'skunumber', 'sku_no', 'sku.number'},
+    'Article code': {'articlecode', 'article_code'},
+    'Sub Product Code': {'subproductcode', 'sub_product_code'},
+    'Work Order Id': {'workorderid', 'work_order_id'},
+    'WO Srl': {'wosrl', 'wo_srl', 'wo.serial', 'wo_srno'},
+    'Qty.1': {'qty.1', 'qty1', 'qty_1'},
+    'Item Id Stone': {'itemidstone', 'item_id_stone'},
+    'Code': {'code'},
+    'QUALITY': {'quality'},
+    'KT': {'kt', 'karat'},
+}
+
+# Compiled once: alias -> canonical column
+_ALIAS_TO_COLUMN = {alias: column for column, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+# Header cells that mark the header row of an order book
+HEADER_KEYS = {
+    'item id', 'itemid', 'item_id', 'work order id', 'wo srl',
+    'article code', 'sub product code', 'ext item id', 'skuno',
+    'sku', 'trans date', 'qty', 'net qty', 'pure qty',
+    'diamond pieces', 'dia wt', 'quality', 'kt', 'code'
+}
+
+# Distinct header layouts whose rename plan is kept
+PLAN_CACHE_SIZE = 256
+
+
+def canon(s) -> str:
+    """Header text on one line with runs of whitespace collapsed."""
+    s = '' if s is None else str(s)
+    s = s.replace('\n', ' ')
+    s = ' '.join(s.split())
+    return s.strip()
+
+
+def canonical_column(label) -> str:
+    """Canonical name of one header cell: its alias target, or the cleaned header itself."""
+    key = canon(label)
+    return _ALIAS_TO_COLUMN.get(key.lower().replace(' ', '').replace('-', '_'), key)
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _rename_plan(signature: tuple) -> dict:
+    # The same export layout arrives again and again; its plan is worked out once
+    return {label: canonical_column(label) for label in signature}
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rename the columns of df to their canonical names and drop the columns that
+    hold no value at all. The rename plan is cached by header signature.
+    """
+    out = df.rename(columns=_rename_plan(tuple(df.columns)))
+    all_nan = out.isna().all().to_numpy()
+    if all_nan.any():
+        out = out.loc[:, ~all_nan]
+    return out
+
+
+def find_header_row(df_head: pd.DataFrame):
+    """
+    Index of the row among the first 25 with the most HEADER_KEYS cells, or None
+    when no row has at least 3 of them.
+    """
+    best_idx, best_hits = None, 0
+    for i in range(min(len(df_head), 25)):
+        row = df_head.iloc[i].astype(str).tolist()
+        hits = sum(1 for cell in row if (cell or '').lower().strip().replace('  ', ' ') in HEADER_KEYS)
+        if hits > best_hits:
+            best_hits, best_idx = hits, i
+    return best_idx if best_hits >= 3 else None
@@ -0,0 +1,179 @@
+import os
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.environ.get('AURA_DB_POOL_SIZE', 4))
+
+
+class Driver:
+    """
+    A DB-API driver the pool can open connections with.
+
+    :param connect: Zero-argument callable returning a new DB-API connection
+    :param paramstyle: 'pyformat' (%s placeholders) or 'qmark' (? placeholders)
+    :param error: Exception class raised by the driver
+    :param server_side_params: Send queries through sp_executesql so SQL Server
+        sees real parameters and can reuse the cached plan
+    """
+
+    def __init__(self, connect, paramstyle='pyformat', error=Exception, server_side_params=False):
+        self.connect = connect
+        self.paramstyle = paramstyle
+        self.error = error
+        self.server_side_params = server_side_params
+
+    def prepare(self, query, params=()):
+        """Translate a query written with %s placeholders for this driver."""
+        params = tuple(params)
+        if self.server_side_params and params:
+            return _sp_executesql(query, params)
+        if self.paramstyle == 'qmark':
+            return query.replace('%s', '?'), params
+        return query, params
+
+
+def _sql_type(value):
+    if isinstance(value, bool):
+        return 'bit'
+    if isinstance(value, int):
+        return 'bigint'
+    if isinstance(value, float):
+        return 'float'
+    return 'nvarchar(4000)'
+
+
+def _sp_executesql(query, params):
+    # Number the placeholders (@p0, @p1, ...) and declare their types for SQL Server
+    pieces = query.split('%s')
+    statement = pieces[0] + ''.join(f'@p{i}' + piece for i, piece in enumerate(pieces[1:]))
+    statement = statement.replace("'", "''").replace('%', '%%')
+    declarations = ', '.join(f'@p{i} {_sql_type(v)}' for i, v in enumerate(params))
+    placeholders = ', '.join(['%s'] * len(params))
+    return f"EXEC sp_executesql N'{statement}', N'{declarations}', {placeholders}", params
+
+
+def pymssql_driver():
+    """SQL Server driver built from the AURA_DB_* environment variables."""
+    server = os.environ.get('AURA_DB_SERVER')
+    database = os.environ.get("AURA_DB_NAME")
+    username = os.environ.get("AURA_DB_USER")
+    password = os.environ.get("AURA_DB_PASSWORD")
+
+    # Check for missing environment variables
+    missing_vars = [name for name, value in [('AURA_DB_SERVER', server), ('AURA_DB_NAME', database),
+                                             ('AURA_DB_USER', username), ('AURA_DB_PASSWORD', password)]
+                    if not value]
+    if missing_vars:
+        raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
+
+    import pymssql
+    return Driver(
+        lambda: pymssql.connect(server=server, user=username, password=password, database=database),
+        paramstyle='pyformat', error=pymssql.Error, server_side_params=True,
+    )
+
+
+def sqlite_driver(path=':memory:'):
+    """SQLite stand-in for the SQL Server, used for local runs and tests."""
+    import sqlite3
+    return Driver(lambda: sqlite3.connect(path, check_same_thread=False),
+                  paramstyle='qmark', error=sqlite3.Error)
+
+
+class ConnectionPool:
+    """Keeps up to `size` idle connections open and hands them out one at a time."""
+
+    def __init__(self, driver, size=POOL_SIZE):
+        self.driver = driver
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self.driver.connect()
+        try:
+            yield conn
+        except Exception:
+            # The connection may be in a broken state; do not hand it out again
+            self._discard(conn)
+            raise
+        else:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error closing database connection: {e}")
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool, created on first use with the SQL Server driver."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(pymssql_driver())
+        return _pool
+
+
+def set_driver(driver, size=POOL_SIZE):
+    """Replace the process-wide pool, e.g. with sqlite_driver() in tests."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(driver, size=size)
+        return _pool
+
+
+def read_frame(query, params=(), chunksize=None, pool=None):
+    """
+    Run a parameterized query (%s placeholders) and return the result as a DataFrame.
+
+    With chunksize set, rows are pulled with fetchmany and turned into DataFrame
+    chunks as they arrive, so the full list of row tuples is never held at once.
+    Decimal values are coerced to float, as pandas.read_sql does.
+    """
+    pool = pool or get_pool()
+    sql, sql_params = pool.driver.prepare(query, params)
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, sql_params)
+            columns = [col[0] for col in cursor.description]
+            if not chunksize:
+                return pd.DataFrame.from_records(cursor.fetchall(), columns=columns, coerce_float=True)
+            chunks = []
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                chunks.append(pd.DataFrame.from_records(rows, columns=columns, coerce_float=True))
+        finally:
+            cursor.close()
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
@@ -1,6 +1,11 @@
 import os
+import re
+import json
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime
 from Clients.reliance.rl_mapping import stamping_mapping, reliance_required_columns
 
 # --- Global default note to appear in every row ---
@@ -62,62 +67,363 @@ def _sheet_name(quality: str, kt: str, count: int, merged: bool = False) -> str:
     # Excel sheet name max length = 31
     return name[:31] if len(name) > 31 else name
 
-def save_to_excel_by_metal(df, output_prefix='output', set_processed=None):
-    # Get unique metal qualities
-    metal_qualities = df['Metal'].unique()
+def _sheet_partitions(df, metal_qualities):
+    """
+    Split df into sheets keyed by (Metal, QualityGroup) in one groupby.
 
-    file_name = output_prefix if output_prefix.endswith('.xlsx') else f"{output_prefix}.xlsx"
+    Yields (metal quality, quality group, row positions) with metals in
+    metal_qualities order and quality groups sorted within each metal, which is
+    the order the sheets are written in. Rows whose Metal is not in
+    metal_qualities are left out.
+    """
+    metal_codes = metal_qualities.get_indexer(df['Metal'])
+    quality_groups = df['OrderGroup'].astype(str).str[-2:].to_numpy()
+    positions = np.flatnonzero(metal_codes >= 0)
+    keys = pd.DataFrame({'metal': metal_codes[positions], 'group': quality_groups[positions]})
+    indices = keys.groupby(['metal', 'group'], sort=True).indices
+    for code, group in sorted(indices):
+        yield metal_qualities[code], group, positions[indices[(code, group)]]
+
+def drop_unknown_sheets(sheet_names):
+    """
+    Sheet filter leaving out sheets whose name contains 'unknown' (case-insensitive,
+    spaces ignored), i.e. groups with no stamping_mapping entry. Nothing is left out
+    when that would leave the workbook without a sheet.
+    """
+    targets = {n for n in sheet_names if 'unknown' in re.sub(r'\s+', '', n.lower())}
+    if targets and len(set(sheet_names) - targets) >= 1:
+        return [n for n in sheet_names if n not in targets]
+    return list(sheet_names)
+
+def _plan_sheets(df, metal_qualities, merged):
+    # Project and stamp the columns once; every sheet is then a row slice of it
+    projected = _drop_excluded(_force_default_sr(filter_columns(df)))
+    kt_values = df['KT_final'] if 'KT_final' in df.columns else None
+
+    for metal_quality, group, rows in _sheet_partitions(df, metal_qualities):
+        stamping_value = stamping_mapping.get(group, 'UNKNOWN')
 
-    normal_df = df.copy()
+        # Determine KT & count
+        kt = (kt_values.iloc[rows[0]] if kt_values is not None else metal_quality) or ''
+        kt = str(kt)
+        count = len(rows)
 
+        # Build sheet name
+        sheet_name = _sheet_name(stamping_value, kt, count, merged=merged)
+        yield sheet_name, projected, rows
+
+def _file_stem(sheet_name):
+    # Sheet names may hold characters that are not allowed in file names
+    return re.sub(r'[\\/:*?"<>|]+', '_', sheet_name).strip() or 'sheet'
+
+def _parquet_frame(frame):
+    # Object columns mix numbers and text; store their values as text so every
+    # partition has the same schema
+    out = frame.copy()
+    for column in out.columns[out.dtypes == object]:
+        values = out[column]
+        out[column] = values.astype(str).where(values.notna() & values.ne(''), None)
+    return out
+
+def _write_xlsx(output_prefix, sheets):
+    file_name = output_prefix if output_prefix.endswith('.xlsx') else f"{output_prefix}.xlsx"
     with pd.ExcelWriter(file_name, engine='xlsxwriter') as writer:
+        for sheet_name, frame in sheets.items():
+            frame.to_excel(writer, sheet_name=sheet_name, index=False)
+    return file_name
 
-        # Process "Normal" items
-        for metal_quality in metal_qualities:
-            metal_normal_df = normal_df[normal_df['Metal'] == metal_quality].copy()
-            metal_normal_df['QualityGroup'] = metal_normal_df['OrderGroup'].astype(str).str[-2:]
+# Rows converted and handed to XlsxWriter at a time by the streaming xlsx backend
+XLSX_STREAM_CHUNK_ROWS = int(os.environ.get('RELIANCE_XLSX_STREAM_CHUNK_ROWS', 5000))
 
-            for group, group_df in metal_normal_df.groupby('QualityGroup'):
-                group_df_filtered = filter_columns(group_df)
-                stamping_value = stamping_mapping.get(group, 'UNKNOWN')
+# Header cell format pandas.to_excel uses (bold, thin border, centered)
+_XLSX_HEADER_FORMAT = {'bold': True, 'align': 'center', 'valign': 'top',
+                       'top': 1, 'right': 1, 'bottom': 1, 'left': 1}
 
-                # Determine KT & count
-                kt = (group_df['KT_final'].iloc[0] if 'KT_final' in group_df.columns else metal_quality) or ''
-                kt = str(kt)
-                count = len(group_df_filtered)
+def _xlsx_cell_values(block):
+    """Column values of a row block as pandas.to_excel writes them: NaN blank, inf as text."""
+    columns = []
+    for _, values in block.items():
+        cells = values.astype(object)
+        if values.dtype.kind == 'f':
+            cells = cells.mask(values == np.inf, 'inf').mask(values == -np.inf, '-inf')
+        columns.append(cells.where(values.notna(), '').tolist())
+    return columns
 
-                # Enforce SpecialRemarks and drop excluded columns
-                group_df_filtered = _force_default_sr(group_df_filtered)
-                group_df_filtered = _drop_excluded(group_df_filtered)
+def _stream_xlsx(file_name, sheets):
+    """
+    Write sheets, an iterable of (sheet name, columns, row blocks), with XlsxWriter's
+    constant_memory mode: each sheet is written top to bottom and every row is
+    flushed to disk once the next one starts.
+    """
+    import xlsxwriter
 
-                # Build sheet name and write
-                sheet_name = _sheet_name(stamping_value, kt, count, merged=False)
-                group_df_filtered.to_excel(writer, sheet_name=sheet_name, index=False)
+    workbook = xlsxwriter.Workbook(file_name, {'constant_memory': True})
+    try:
+        header_format = workbook.add_format(_XLSX_HEADER_FORMAT)
+        datetime_format = workbook.add_format({'num_format': 'YYYY-MM-DD HH:MM:SS'})
+        date_format = workbook.add_format({'num_format': 'YYYY-MM-DD'})
+        for sheet_name, header, blocks in sheets:
+            worksheet = workbook.add_worksheet(sheet_name)
+            for col, column in enumerate(header):
+                worksheet.write(0, col, column, header_format)
+            start = 1
+            for block in blocks:
+                columns = _xlsx_cell_values(block)
+                for offset, row in enumerate(zip(*columns), start=start):
+                    for col, value in enumerate(row):
+                        if isinstance(value, datetime):
+                            worksheet.write_datetime(offset, col, value, datetime_format)
+                        elif isinstance(value, date):
+                            worksheet.write_datetime(offset, col, value, date_format)
+                        else:
+                            worksheet.write(offset, col, value)
+                start += len(block)
+    finally:
+        workbook.close()
+    return file_name
 
-        # Process set_processed if available
-        if set_processed is not None and not set_processed.empty:
-            for metal_quality in metal_qualities:
-                set_processed_normal_df = set_processed[set_processed['Metal'] == metal_quality].copy()
-                set_processed_normal_df['QualityGroup'] = set_processed_normal_df['OrderGroup'].astype(str).str[-2:]
+def _row_blocks(frame):
+    for start in range(0, len(frame), XLSX_STREAM_CHUNK_ROWS):
+        yield frame.iloc[start:start + XLSX_STREAM_CHUNK_ROWS]
+
+def _write_xlsx_streaming(output_prefix, sheets):
+    """
+    Same workbook as _write_xlsx, written in XLSX_STREAM_CHUNK_ROWS row blocks with
+    XlsxWriter's constant_memory mode, so the writer holds one row instead of
+    every cell of the workbook.
+    """
+    file_name = output_prefix if output_prefix.endswith('.xlsx') else f"{output_prefix}.xlsx"
+    return _stream_xlsx(file_name, ((sheet_name, frame.columns, _row_blocks(frame))
+                                    for sheet_name, frame in sheets.items()))
 
-                for group, group_df in set_processed_normal_df.groupby('QualityGroup'):
-                    group_df_filtered = filter_columns(group_df)
-                    stamping_value = stamping_mapping.get(group, 'UNKNOWN')
+def _write_files(output_prefix, sheets, extension, write):
+    # One file per sheet in a folder named after the output prefix
+    out_dir = output_prefix[:-len('.xlsx')] if output_prefix.endswith('.xlsx') else output_prefix
+    os.makedirs(out_dir, exist_ok=True)
+    for sheet_name, frame in sheets.items():
+        write(frame, os.path.join(out_dir, f"{_file_stem(sheet_name)}.{extension}"))
+    return out_dir
 
-                    kt = (group_df['KT_final'].iloc[0] if 'KT_final' in group_df.columns else metal_quality) or ''
-                    kt = str(kt)
-                    count = len(group_df_filtered)
+def _write_jsonl_file(frame, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in sheet_records(frame):
+            f.write(json.dumps(record, ensure_ascii=False, default=str))
+            f.write('\n')
+
+def _write_parquet_dataset(output_prefix, sheets):
+    # A single Parquet dataset partitioned by a 'sheet' column (sheet=<name>/ folders)
+    out_dir = output_prefix[:-len('.xlsx')] if output_prefix.endswith('.xlsx') else output_prefix
+    if sheets:
+        dataset = pd.concat([_parquet_frame(frame).assign(sheet=sheet_name) for sheet_name, frame in sheets.items()],
+                            ignore_index=True, sort=False)
+        dataset.to_parquet(out_dir, partition_cols=['sheet'], index=False)
+    else:
+        os.makedirs(out_dir, exist_ok=True)
+    return out_dir
 
-                    group_df_filtered = _force_default_sr(group_df_filtered)
-                    group_df_filtered = _drop_excluded(group_df_filtered)
+# Output backends: name -> writer(output_prefix, {sheet name: frame}) returning the output path
+OUTPUT_BACKENDS = {
+    'xlsx': _write_xlsx,
+    'xlsx-stream': _write_xlsx_streaming,
+    'csv': lambda prefix, sheets: _write_files(
+        prefix, sheets, 'csv', lambda frame, path: frame.to_csv(path, index=False)),
+    'jsonl': lambda prefix, sheets: _write_files(prefix, sheets, 'jsonl', _write_jsonl_file),
+    'parquet': lambda prefix, sheets: _write_files(
+        prefix, sheets, 'parquet', lambda frame, path: _parquet_frame(frame).to_parquet(path, index=False)),
+    'parquet-dataset': _write_parquet_dataset,
+}
 
-                    sheet_name = _sheet_name(stamping_value, kt, count, merged=True)
-                    group_df_filtered.to_excel(writer, sheet_name=sheet_name, index=False)
+# Default backend; the non-xlsx backends write a folder named after the output prefix
+OUTPUT_FORMAT = os.environ.get('RELIANCE_OUTPUT_FORMAT', 'xlsx')
+
+def save_to_excel_by_metal(df, output_prefix='output', set_processed=None, sheet_filter=None,
+                           return_sheets=False, output_format=None):
+    """
+    Write one sheet per (Metal, QualityGroup), normal items first, then set items.
+
+    :param sheet_filter: Optional callable taking the planned sheet names (in write
+        order) and returning the ones to write, e.g. drop_unknown_sheets
+    :param return_sheets: Also return {sheet name: frame written to it}
+    :param output_format: Key of OUTPUT_BACKENDS (defaults to RELIANCE_OUTPUT_FORMAT);
+        every backend gets the same sheets, names and columns
+    """
+    output_format = output_format or OUTPUT_FORMAT
+    if output_format not in OUTPUT_BACKENDS:
+        raise ValueError(f"Unknown output format '{output_format}'; expected one of {', '.join(OUTPUT_BACKENDS)}")
+
+    # Get unique metal qualities; set items are only written for metals of the normal items
+    metal_qualities = pd.Index(df['Metal'].unique()).dropna()
+
+    # Process "Normal" items
+    sheets = list(_plan_sheets(df, metal_qualities, merged=False))
+
+    # Process set_processed if available
+    if set_processed is not None and not set_processed.empty:
+        sheets += list(_plan_sheets(set_processed, metal_qualities, merged=True))
+
+    if sheet_filter is not None:
+        keep = set(sheet_filter([sheet_name for sheet_name, _, _ in sheets]))
+        sheets = [sheet for sheet in sheets if sheet[0] in keep]
+
+    # A repeated sheet name overwrites the earlier sheet of the same size, as in the workbook
+    written = {}
+    for sheet_name, projected, rows in sheets:
+        written[sheet_name] = projected.iloc[rows]
+
+    file_name = OUTPUT_BACKENDS[output_format](output_prefix, written)
 
     print(f"File saved: {file_name}")
+    if return_sheets:
+        return file_name, written
     return file_name
 
-def process_and_export(df, output_prefix='output', set_processed=None):
+class SheetSpool:
+    """
+    save_to_excel_by_metal for a frame that arrives in chunks (see
+    run_reliance_local.run_offline_streaming).
+
+    add() splits each chunk into its (Metal, QualityGroup) partitions and appends
+    them to spool files on disk, so only the current chunk is held in memory.
+    close() names the sheets from the final row counts and streams them into one
+    constant-memory workbook, with the same sheets, order and names
+    save_to_excel_by_metal gives for the chunks concatenated.
+
+    :param sheet_filter: As for save_to_excel_by_metal
+    :param spool_dir: Parent folder of the spool files (defaults to the system temp folder)
+    """
+
+    def __init__(self, output_prefix='output', sheet_filter=None, spool_dir=None):
+        self.output_prefix = output_prefix
+        self.sheet_filter = sheet_filter
+        self._dir = tempfile.mkdtemp(prefix='rl_spool_', dir=spool_dir)
+        self._metals = {}
+        self._parts = {}
+        self._files = 0
+
+    def add(self, df, set_processed=None):
+        """Spool one chunk of normal items and the set items that came with it."""
+        df = _drop_excluded(_force_default_sr(ensure_columns(df)))
+        # Metals in order of first appearance over all chunks, as df['Metal'].unique() gives
+        self._metals.update(dict.fromkeys(pd.Index(df['Metal'].unique()).dropna()))
+        self._spool(df, merged=False)
+        if set_processed is not None and not set_processed.empty:
+            self._spool(_drop_excluded(_force_default_sr(ensure_columns(set_processed))), merged=True)
+
+    def _spool(self, df, merged):
+        projected = _drop_excluded(_force_default_sr(filter_columns(df)))
+        kt_values = df['KT_final'] if 'KT_final' in df.columns else None
+        for metal_quality, group, rows in _sheet_partitions(df, pd.Index(df['Metal'].unique()).dropna()):
+            part = self._parts.get((merged, metal_quality, group))
+            if part is None:
+                # The sheet's KT comes from its first row
+                kt = (kt_values.iloc[rows[0]] if kt_values is not None else metal_quality) or ''
+                part = self._parts[(merged, metal_quality, group)] = {
+                    'kt': str(kt), 'columns': projected.columns, 'count': 0, 'files': []}
+            path = os.path.join(self._dir, f"{self._files}.pkl")
+            self._files += 1
+            projected.iloc[rows].to_pickle(path)
+            part['count'] += len(rows)
+            part['files'].append(path)
+
+    def close(self):
+        """Write the workbook and return its path; the spool files are removed."""
+        try:
+            metal_order = {metal: i for i, metal in enumerate(self._metals)}
+            # Normal items first, then set items of the metals the normal items have
+            keys = sorted((key for key in self._parts if key[1] in metal_order),
+                          key=lambda key: (key[0], metal_order[key[1]], key[2]))
+            sheets = []
+            for merged, metal_quality, group in keys:
+                part = self._parts[(merged, metal_quality, group)]
+                sheet_name = _sheet_name(stamping_mapping.get(group, 'UNKNOWN'), part['kt'], part['count'],
+                                         merged=merged)
+                sheets.append((sheet_name, part))
+
+            if self.sheet_filter is not None:
+                keep = set(self.sheet_filter([sheet_name for sheet_name, _ in sheets]))
+                sheets = [sheet for sheet in sheets if sheet[0] in keep]
+
+            # A repeated sheet name overwrites the earlier sheet of the same size, as in the workbook
+            written = {}
+            for sheet_name, part in sheets:
+                written[sheet_name] = part
+
+            file_name = self.output_prefix if self.output_prefix.endswith('.xlsx') else f"{self.output_prefix}.xlsx"
+            _stream_xlsx(file_name, ((sheet_name, part['columns'], self._read_part(part))
+                                     for sheet_name, part in written.items()))
+        finally:
+            self.discard()
+        print(f"File saved: {file_name}")
+        return file_name
+
+    def _read_part(self, part):
+        # Chunks leave many small pieces per sheet; they are written in blocks of
+        # up to XLSX_STREAM_CHUNK_ROWS rows, as _write_xlsx_streaming does
+        pending, rows = [], 0
+        for path in part['files']:
+            frame = pd.read_pickle(path)
+            pending.append(frame)
+            rows += len(frame)
+            if rows >= XLSX_STREAM_CHUNK_ROWS:
+                yield from _row_blocks(pd.concat(pending))
+                pending, rows = [], 0
+        if pending:
+            yield from _row_blocks(pd.concat(pending))
+
+    def discard(self):
+        """Remove the spool files without writing a workbook."""
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+def _numeric_text_columns(frame):
+    """
+    frame with every object or categorical column whose non-empty cells all parse
+    as numbers converted with pd.to_numeric, as read_excel infers them when the
+    workbook is read back; columns with any text cell are left as they are.
+    """
+    out = frame
+    textual = [dtype == object or isinstance(dtype, pd.CategoricalDtype) for dtype in frame.dtypes]
+    for i in np.flatnonzero(textual):
+        values = frame.iloc[:, i].astype(object)
+        present = values.notna() & values.ne('')
+        if not present.any() or values[present].map(type).eq(bool).any():
+            continue
+        try:
+            numbers = pd.to_numeric(values.where(present))
+        except (ValueError, TypeError):
+            continue
+        if out is frame:
+            out = frame.copy()
+        out.isetitem(i, numbers)
+    return out
+
+def sheet_records(frame):
+    """
+    Rows of a written sheet as JSON-ready dicts, typed as convert_excel_to_json reads
+    them back from the workbook: empty cells (NaN, None, '') become None, columns of
+    numeric text become numbers and NumPy scalars become Python values.
+    """
+    frame = _numeric_text_columns(frame)
+    values = frame.astype(object)
+    return values.where(frame.notna() & frame.ne(''), None).to_dict(orient='records')
+
+def sheets_to_json(sheets):
+    """{sheet name: list of row dicts} for the sheets returned by process_and_export."""
+    return {sheet_name: sheet_records(frame) for sheet_name, frame in sheets.items()}
+
+def write_sheets_jsonl(sheets, path):
+    """
+    Stream the sheets to a JSON Lines file, one {"sheet": ..., "row": {...}} object per
+    row, without building the whole document in memory. Returns path.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for sheet_name, frame in sheets.items():
+            for record in sheet_records(frame):
+                f.write(json.dumps({'sheet': sheet_name, 'row': record}, ensure_ascii=False, default=str))
+                f.write('\n')
+    return path
+
+def process_and_export(df, output_prefix='output', set_processed=None, sheet_filter=None, return_sheets=False,
+                       output_format=None):
     # Ensure required columns are present in the DataFrame
     df = ensure_columns(df)
     # Always enforce default SpecialRemarks + drop excluded before writing
@@ -128,7 +434,7 @@ def process_and_export(df, output_prefix='output', set_processed=None):
         set_processed1 = ensure_columns(set_processed)
         set_processed1 = _force_default_sr(set_processed1)
         set_processed1 = _drop_excluded(set_processed1)
-        return save_to_excel_by_metal(df, output_prefix, set_processed1)
+        return save_to_excel_by_metal(df, output_prefix, set_processed1, sheet_filter, return_sheets, output_format)
 
     # Save DataFrame into an Excel file and return the file path
-    return save_to_excel_by_metal(df, output_prefix, set_processed)
+    return save_to_excel_by_metal(df, output_prefix, set_processed, sheet_filter, return_sheets, output_format)
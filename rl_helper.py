@@ -1,8 +1,9 @@
+import numpy as np
 import pandas as pd
 from io import BytesIO
-from rl_mapping import tone_mapping,stamping_mapping
+from rl_mapping import tone_mapping,stamping_mapping,mapping_for_quality
 from rl_mapping import rng_mapping, brc_mapping, bng_mapping, msr_mapping, last_two_digit_mapping, first_digit_mapping
-from rl_mapping import valid_product_categories, order_group_mapping, article_code_mapping
+from rl_mapping import valid_product_categories, order_group_mapping, article_code_mapping, STONE_TOTAL_COLUMNS
 import logging
 from datetime import timedelta
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -11,38 +12,54 @@ import json
 import traceback
 
 
-def helper_reliance(actual_order, threshold=0.99):
+def helper_reliance(actual_order, threshold=0.99, footer_rows=4, keep_columns=None):
+    """
+    Aggregate the stone rows of an order book onto the first row of each WO Srl.
+
+    :param footer_rows: Summary rows at the bottom of the book to remove (0 for
+        a chunk that has no footer)
+    :param keep_columns: Columns to keep, worked out over the whole book; when
+        None, columns with more than threshold NaN values in actual_order are dropped
+    """
     try:
         logging.info(f"Initial DataFrame shape: {actual_order.shape}")
         
-        # Remove the last 4 rows
-        actual_order = actual_order.iloc[:-4]
-        logger.info(f"After removing the last 4 rows: {actual_order.shape}")
+        # Remove the footer rows
+        if footer_rows:
+            actual_order = actual_order.iloc[:-footer_rows]
+            logger.info(f"After removing the last {footer_rows} rows: {actual_order.shape}")
         
         # Drop columns with more than 99% NaN values
-        actual_order = actual_order.dropna(thresh=len(actual_order) * (1 - threshold), axis=1)
+        if keep_columns is None:
+            actual_order = actual_order.dropna(thresh=len(actual_order) * (1 - threshold), axis=1)
+        else:
+            actual_order = actual_order.loc[:, actual_order.columns.isin(keep_columns)]
         logger.info(f"After dropping columns with > {threshold*100}% NaN values: {actual_order.shape}")
         
-        # Filter rows where 'Item Id Stone' is 'DRD-IGI' and group by 'WO Srl' to get the sum of 'Qty.1'
-        filtered_sum = actual_order[actual_order['Item Id Stone'] == 'DRD-IGI']\
-                       .groupby('WO Srl')['Qty.1'].sum().round(4)
-        logger.info("Filtered and grouped by 'WO Srl' to get diamond weight sum.")
-
-        filtered_sum_diamond_pieces = actual_order[actual_order['Item Id Stone'] == 'DRD-IGI']\
-                              .groupby('WO Srl')['Pds CW Qty'].sum().round(4)
-        
-        # Map diamond pieces sum to 'Diamond Pieces' column
-        
-        # Remove duplicates, keeping only the first instance of 'WO Srl'
-        unique_srl_df = actual_order.drop_duplicates(subset='WO Srl', keep='first').copy(deep=True)
+        # Weight and piece totals per WO Srl for the stone types of STONE_TOTAL_COLUMNS, in one
+        # groupby; other stone codes get no columns, so every book exports the same columns
+        is_totalled = actual_order['Item Id Stone'].isin(list(STONE_TOTAL_COLUMNS))
+        untotalled = actual_order.loc[~is_totalled, 'Item Id Stone'].dropna().unique()
+        if len(untotalled):
+            logger.info(f"Stone types without total columns, not totalled: {', '.join(map(str, untotalled))}")
+        stone_totals = actual_order[is_totalled].groupby(['WO Srl', 'Item Id Stone'], observed=True)\
+                                                [['Qty.1', 'Pds CW Qty']].sum().round(4)
+        logger.info("Grouped by 'WO Srl' and 'Item Id Stone' to get stone weight and piece sums.")
+
+        # Keep only the first instance of 'WO Srl' (take() returns a new frame; no extra copy needed)
+        first_srl = ~actual_order['WO Srl'].duplicated(keep='first').to_numpy()
+        unique_srl_df = actual_order.take(np.flatnonzero(first_srl))
         logger.info(f"After removing duplicate 'WO Srl' entries: {unique_srl_df.shape}")
-        
-        unique_srl_df['Dia Wt'] = unique_srl_df['WO Srl'].map(filtered_sum)
-        unique_srl_df['Diamond Pieces'] = unique_srl_df['WO Srl'].map(filtered_sum_diamond_pieces)
-        unique_srl_df['Diamond Pieces'] = unique_srl_df['Diamond Pieces'].fillna(0)
-        # Fill NaN values with 0 for rows where 'Item Id Stone' is not 'DRD-IGI'
-        unique_srl_df['Dia Wt'] = unique_srl_df['Dia Wt'].fillna(0)
-        logger.info("Mapped diamond weights and filled NaN values.")
+
+        # Map each stone's totals to its columns; every column is added even when the book has no such stone
+        stones = stone_totals.index.get_level_values('Item Id Stone').unique()
+        for stone, (weight_column, pieces_column) in STONE_TOTAL_COLUMNS.items():
+            if stone in stones:
+                per_stone = stone_totals.xs(stone, level='Item Id Stone')
+            else:
+                per_stone = stone_totals.iloc[:0].droplevel('Item Id Stone')
+            unique_srl_df[weight_column] = unique_srl_df['WO Srl'].map(per_stone['Qty.1']).fillna(0)
+            unique_srl_df[pieces_column] = unique_srl_df['WO Srl'].map(per_stone['Pds CW Qty']).fillna(0)
         logger.info("Mapped diamond weights and diamond pieces, and filled NaN values.")
         # Log the final shape of the DataFrame
         logger.info(f"Final DataFrame shape: {unique_srl_df.shape}")
@@ -103,6 +120,110 @@ def map_order_group(row):
         logger.error(f'Error processing row: {row} - {e}')
         return ''
     
+# Article code -> order group family, mirroring the branches of map_order_group
+_ORDER_GROUP_FAMILY = {
+    'RNG': 'RNG',
+    'BRC': 'BRC', 'BAN': 'BRC', 'BLT': 'BRC',
+    'BNG': 'BNG', 'BAG': 'BNG',
+    'MSR': 'MSR',
+    'ERG': 'ERG',
+    'PDC': 'PDC',
+}
+
+# (family, Item Id[11:13]) -> ItemSize, flattened once from the rl_mapping tables
+_ORDER_GROUP_LOOKUP = {
+    **{f"RNG|{code}": size for code, size in rng_mapping.items()},
+    **{f"BRC|{code}": size for code, size in brc_mapping.items()},
+    **{f"BNG|{code}": size for code, size in bng_mapping.items()},
+    **{f"MSR|{code}": size for code, size in msr_mapping.items()},
+    **{f"PDC|{code}": size for code, size in msr_mapping.items()},
+}
+
+# Item Id is a fixed-width code; every position read by the pipeline lies in its first 16 characters
+ITEM_ID_HEAD = 16
+
+def split_item_id(item_id):
+    """
+    Split fixed-width Item Id codes into their components in one pass.
+
+    Returns a DataFrame on item_id's index with metal (position 0), order_group
+    ([11:13], '' when shorter), size ([13:15], '' when shorter), tone (position 15,
+    NaN when shorter), last_two ([-2:], '' when shorter than 2) and present
+    (False where the Item Id is missing).
+    """
+    present = item_id.notna()
+    ids = item_id.where(present, '').astype(str)
+    lengths = ids.str.len().to_numpy()
+
+    # One fixed-width character matrix holding the head of every code
+    head = np.asarray(ids.to_numpy(), dtype=f'U{ITEM_ID_HEAD}')
+    chars = head.view('U1').reshape(len(head), ITEM_ID_HEAD)
+
+    return pd.DataFrame({
+        'metal': np.where(lengths >= 1, chars[:, 0].astype(object), np.nan),
+        'order_group': np.where(lengths >= 13, np.char.add(chars[:, 11], chars[:, 12]), '').astype(object),
+        'size': np.where(lengths >= 15, np.char.add(chars[:, 13], chars[:, 14]), '').astype(object),
+        'tone': np.where(lengths >= 16, chars[:, 15].astype(object), np.nan),
+        'last_two': ids.str[-2:].where(lengths >= 2, ''),
+        'present': present,
+    }, index=item_id.index)
+
+def _item_size(parts, article_code):
+    # ItemSize from the order group / size codes, following the branches of map_order_group
+    family = pd.Series(article_code, index=parts.index).map(_ORDER_GROUP_FAMILY)
+    item_size = (family + '|' + parts['order_group']).map(_ORDER_GROUP_LOOKUP).fillna('').to_numpy(dtype=object)
+
+    is_pdc = (family == 'PDC').to_numpy()
+    item_size[is_pdc] = item_size[is_pdc] + ' INCH'
+
+    is_erg = (family == 'ERG').to_numpy()
+    size_code = parts['size']
+    erg_size = np.where(~size_code.isin(['', '71', '76']).to_numpy(), size_code.to_numpy(dtype=object), '')
+    item_size[is_erg] = erg_size[is_erg]
+
+    # Rows without an Item Id fall back to '' like the per-row error path
+    item_size[~parts['present'].to_numpy()] = ''
+    return pd.Series(item_size, index=parts.index, dtype=object)
+
+def map_order_group_vectorized(df):
+    """
+    Columnar version of map_order_group: returns the ItemSize Series for every row
+    of df using vector lookups instead of a Python call per row.
+    """
+    if 'Item Id' not in df.columns or 'Article code' not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    return _item_size(split_item_id(df['Item Id']), df['Article code'].to_numpy())
+
+# Metal is held as a categorical over the metal qualities of mapping_for_quality
+_METAL_CATEGORIES = list(dict.fromkeys(mapping_for_quality.values()))
+
+def decode_item_id(item_id, article_code=None):
+    """
+    Derive the columns read from fixed Item Id positions with vector lookups against
+    rl_mapping, replacing the per-row map_tone / generate_customer_productinstruction
+    calls.
+
+    Returns a DataFrame on item_id's index with Metal (mapping_for_quality as a
+    categorical, NaN when unmapped), Tone (tone_mapping, unmapped codes kept as they are),
+    CustomerProductionInstruction (stamping_mapping on the last two characters),
+    StampFirst / StampLast (first_digit_mapping / last_two_digit_mapping, as
+    stamping_instruct uses them) and, when article_code is given, ItemSize.
+    """
+    parts = split_item_id(item_id)
+
+    tone = parts['tone']
+    stamping = parts['last_two'].map(stamping_mapping).fillna('UNKNOWN')
+    decoded = pd.DataFrame({
+        'Metal': pd.Categorical(parts['metal'].map(mapping_for_quality), categories=_METAL_CATEGORIES),
+        'Tone': tone.map(tone_mapping).where(tone.isin(list(tone_mapping)), tone),
+        'CustomerProductionInstruction': 'IGI CERT-(' + stamping + '), HALLMARK (STAMPING ON BOTH PART)',
+        'StampFirst': parts['metal'].map(first_digit_mapping),
+        'StampLast': parts['last_two'].map(last_two_digit_mapping),
+    }, index=item_id.index)
+    if article_code is not None:
+        decoded['ItemSize'] = _item_size(parts, np.asarray(article_code, dtype=object))
+    return decoded
+
 def split_ext_item_id(df):
 
     # Splitting rows with '+'
@@ -124,13 +245,10 @@ def stamping_instruct(df):
         if 'Item Id' not in df.columns or 'Article code' not in df.columns:
             raise ValueError("DataFrame must contain 'Item Id' and 'Article Code' columns")
 
-        # Extract the first character and the last two characters
-        first_chars = df['Item Id'].str[0]
-        last_two_chars = df['Item Id'].str[-2:]
-
-        # Map the extracted characters to the desired values
-        first_char_mapped = first_chars.map(first_digit_mapping)
-        last_two_chars_mapped = last_two_chars.map(last_two_digit_mapping)
+        # Map the first character and the last two characters to the desired values
+        decoded = decode_item_id(df['Item Id'])
+        first_char_mapped = decoded['StampFirst']
+        last_two_chars_mapped = decoded['StampLast']
 
         # Initialize the 'Stamping' column
         df['StampInstruction'] = (
@@ -157,31 +275,27 @@ def check_style_master(df, client_style_master):
     # Initialize the 'Checking_set' column to 0 by default
     df['Checking_set'] = 0
 
-    # Filter rows where Article code is not 'SET'
-    filtered_rows = df[df['Article code'] != 'SET']
-
-    # Loop through each filtered row to check for matches
-    for index, row in filtered_rows.iterrows():
-        # Get the last two digits from the 'Item Id'
-        last_two_digits = row['Item Id'][-2:]
+    # Filter the master by product category once and build the (style, party) key set
+    valid_master = client_style_master[
+        client_style_master['SubGroupPrdctCtg'].isin(valid_product_categories)
+    ]
+    valid_master = valid_master.dropna(subset=['Client Style No', 'PartyName'])
+    master_keys = pd.MultiIndex.from_arrays(
+        [valid_master['Client Style No'], valid_master['PartyName']]
+    ).unique()
 
-        # Get the corresponding party name from the mapping
-        party_name = last_two_digit_mapping.get(last_two_digits)
+    # Party name is derived from the last two digits of the 'Item Id'
+    party_name = df['Item Id'].astype('string').str[-2:].map(last_two_digit_mapping)
+    search_string = 'Reliance Retail Ltd ' + party_name.astype('string')
 
-        if party_name:
-            # Create the search string for matching
-            search_string = f"Reliance Retail Ltd {party_name}"
+    # Only non-SET rows with a mapped party and a style number can match
+    candidates = (df['Article code'] != 'SET') & party_name.notna() & df['Ext Item Id'].notna()
+    order_keys = pd.MultiIndex.from_arrays([df['Ext Item Id'], search_string])
+    matched = candidates.to_numpy() & order_keys.isin(master_keys)
 
-            # Check if the Ext Item Id exists in client_style_master for the given party name
-            matches = client_style_master[
-                (client_style_master['Client Style No'] == row['Ext Item Id']) &
-                (client_style_master['PartyName'] == search_string)&
-                (client_style_master['SubGroupPrdctCtg'].isin(valid_product_categories))
-            ]
-
-            # If matches exist, update the Checking_set column
-            if not matches.empty:
-                df.at[index, 'Checking_set'] = 1
+    # Update by label so duplicated indices (exploded SET rows) behave as before
+    if matched.any():
+        df.loc[df.index.isin(df.index[matched]), 'Checking_set'] = 1
 
     return df
 
@@ -231,24 +345,23 @@ def process_special_remarks(df):
         #     if row['Article code'] == 'SET'  and row['merged_set'] == 1 else f"MAINTAIN DIA.WT- {row['Dia Wt']} CTS, DIA TOL (+ - 3%)",
         #     axis=1
         # )
-        df['SpecialRemarks'] = df.apply(
-            lambda row: f"MAINTAIN SET DIA.WT- {row['Dia Wt']} CTS, DIA TOL (+ - 3%)"
-            if ('SET' in str(row['Article code']).upper() or 'SET' in str(row['Sub Product Code']).upper())  and row['merged_set'] == 1 else f"MAINTAIN DIA.WT- {row['Dia Wt']} CTS, DIA TOL (+ - 3%)",
-            axis=1
+        is_set = (
+            df['Article code'].astype(str).str.upper().str.contains('SET', regex=False) |
+            df['Sub Product Code'].astype(str).str.upper().str.contains('SET', regex=False)
+        ) & (df['merged_set'] == 1)
+        dia_wt = df['Dia Wt'].astype(str)
+        df['SpecialRemarks'] = np.where(
+            is_set,
+            "MAINTAIN SET DIA.WT- " + dia_wt + " CTS, DIA TOL (+ - 3%)",
+            "MAINTAIN DIA.WT- " + dia_wt + " CTS, DIA TOL (+ - 3%)",
         )
 
         # Step 2: Handle the prefix based on 'OrderGroup' 14-15 digits for 'ERG'
         erg_condition = df['Article code'].isin(['ERG', 'NSO', 'NSP'])
         if erg_condition.any():
-            df['OrderGroup_14_15'] = df.loc[erg_condition, 'Item Id'].str[13:15]
-
             # Map the OrderGroup 14-15 values to the prefix from order_group_mapping
-            df.loc[erg_condition, 'SpecialRemarks'] = (
-                df.loc[erg_condition, 'OrderGroup_14_15'].map(order_group_mapping).fillna('') + " " + df['SpecialRemarks']
-            )
-
-            # Drop the temporary column after processing
-            df.drop(columns=['OrderGroup_14_15'], inplace=True)
+            prefix = df.loc[erg_condition, 'Item Id'].str[13:15].map(order_group_mapping).fillna('')
+            df.loc[erg_condition, 'SpecialRemarks'] = prefix + " " + df['SpecialRemarks']
 
         # Step 3: Add suffixes for specific Article Codes
         df.loc[df['Article code'].isin(['MSR']), 'SpecialRemarks'] += " WITH CHAIN"
@@ -264,29 +377,25 @@ def process_special_remarks(df):
 
     # Append " WITH CHAIN" to 'SpecialRemarks' for rows that meet the condition
         df.loc[condition2, 'SpecialRemarks'] += " WITH CHAIN"
+        # Masks are applied by position, so exploded SET rows sharing an index label
+        # get the bangle text too (the old per-label writes skipped them)
         condition_bangle = df['withchain'].str.contains('BANGLE', na=False, case=False)
-
-        for idx, row in df.loc[condition_bangle].iterrows():
-            try:
-                item_id_code = row['Item Id'][13:15]
-                
-                if item_id_code == 'B1':
-                    df.loc[idx, 'SpecialRemarks'] = (
-                        (df.loc[idx, 'SpecialRemarks'] or '') + 
-                        " QUANTITY FOR SINGLE BANGLE (MAKE SINGLE PCS)"
-                    )
-                elif item_id_code == 'B2':
-                    df.loc[idx, 'SpecialRemarks'] = (
-                        (df.loc[idx, 'SpecialRemarks'] or '') + 
-                        " [QUANTITY FOR PAIR BANGLE, MAKE PAIR]"
-                    )
-                    df.loc[idx, 'CustomerProductionInstruction'] = (
-                        (df.loc[idx, 'CustomerProductionInstruction'] or '') + 
-                        " NEED CERTIFICATE OF PAIR"
-                    )
-                
-            except Exception as e:
-                logger.error(f"Error processing row {idx}: {e}")
+        item_id_code = df['Item Id'].str[13:15]
+        single_bangle = (condition_bangle & (item_id_code == 'B1')).to_numpy()
+        pair_bangle = (condition_bangle & (item_id_code == 'B2')).to_numpy()
+
+        remarks = df['SpecialRemarks'].to_numpy(dtype=object)
+        remarks[single_bangle] += " QUANTITY FOR SINGLE BANGLE (MAKE SINGLE PCS)"
+        remarks[pair_bangle] += " [QUANTITY FOR PAIR BANGLE, MAKE PAIR]"
+        df['SpecialRemarks'] = remarks
+
+        if pair_bangle.any() and 'CustomerProductionInstruction' in df.columns:
+            instructions = df['CustomerProductionInstruction'].to_numpy(dtype=object)
+            instructions[pair_bangle] = (
+                df.loc[pair_bangle, 'CustomerProductionInstruction'].fillna('').to_numpy(dtype=object) +
+                " NEED CERTIFICATE OF PAIR"
+            )
+            df['CustomerProductionInstruction'] = instructions
 
     except Exception as e:
         logger.error(f"An error occurred: {e}")
@@ -313,49 +422,64 @@ def validate_order(actual_order_df, style_code_df):
     
     # Create a copy of the actual_order DataFrame to avoid modifying the original
     actual_order_copy = actual_order_df.copy(deep=True)
-    
-    # Initialize the Error and Wrong Style Code columns
-    actual_order_copy['Error'] = None
-    actual_order_copy['wrong_style_code'] = 0
 
-    # Iterate over rows in actual_order_copy
-    for index, row in actual_order_copy.iterrows():
+    # Deduplicate the reference once; the first occurrence is the reference row
+    reference_unique = style_code_df.drop_duplicates(subset='StyleCode', keep='first')
+    reference_index = pd.Index(reference_unique['StyleCode'])
+
+    # Position of each order line in the reference (-1 when the design is unknown)
+    item_ids = actual_order_copy['Ext Item Id']
+    positions = reference_index.get_indexer(item_ids)
+    positions[item_ids.isna().to_numpy()] = -1
+    found = positions >= 0
+    ref_positions = positions[found]
+
+    errors = np.full(len(actual_order_copy), None, dtype=object)
+    wrong_style_code = np.where(found, 0, 1)
+    errors[~found] = "Design number is wrong"
+
+    if found.any():
         try:
-            item_id = row['Ext Item Id']
-            
-            # Check if Item Id is in the reference style_code_df
-            if item_id in style_code_df['StyleCode'].values:
-                # Fetch the corresponding reference row for the current item_id
-                reference_row = style_code_df[style_code_df['StyleCode'] == item_id].iloc[0]
-                 
-                # Validate Dia Wt and Diamond Pieces
-                errors = []
-                tolerance = 0.03 * reference_row['DiamondWt']
-                lower_bound = reference_row['DiamondWt'] - tolerance
-                upper_bound = reference_row['DiamondWt'] + tolerance
-                # print(f"This is the Order diamond pieces {row['Diamond Pieces']} and this is the Master Diamond pieces {reference_row['DiamondPcs']}")
-                
-                if not (lower_bound <= row['Dia Wt'] <= upper_bound):
-                    errors.append(f"Dia Wt doesn't match (±3% tolerance), This is the master diamond weight {reference_row['DiamondWt']}")
-                    # print(f"Dia Wt doesn't match (±3% tolerance), This is the master diamond weight {reference_row['DiamondWt']}")
-                if row['Diamond Pieces'] != reference_row['DiamondPcs']:
-                    errors.append(f"Diamond Pieces didn't match, This is the master diamond pieces {reference_row['DiamondPcs']}")
-                if row['withchain'] == 'BANGLE':
-                    errors.append('PLEASE CHECK BANGLE SIZE')
-                    # print(f"Diamond Pieces didn't match, This is the master diamond pieces {reference_row['DiamondPcs']}")
-                # Update Error column if there are any validation errors
-                if errors:
-                    actual_order_copy.at[index, 'Error'] = ', '.join(errors)
-            
-            else:
-                # If Item Id is not found in reference, mark Wrong Style Code as 1
-                actual_order_copy.at[index, 'wrong_style_code'] = 1
-                actual_order_copy.at[index, 'Error'] = "Design number is wrong"
-        
+            master_wt = reference_unique['DiamondWt'].to_numpy()[ref_positions]
+            master_pcs = reference_unique['DiamondPcs'].to_numpy()[ref_positions]
+            dia_wt = actual_order_copy['Dia Wt'].to_numpy()[found]
+            dia_pcs = actual_order_copy['Diamond Pieces'].to_numpy()[found]
+            withchain = actual_order_copy['withchain'].to_numpy()[found]
+
+            # Validate Dia Wt (±3% window) and Diamond Pieces
+            tolerance = 0.03 * master_wt
+            lower_bound = master_wt - tolerance
+            upper_bound = master_wt + tolerance
+            wt_error = ~((lower_bound <= dia_wt) & (dia_wt <= upper_bound)).astype(bool)
+            pcs_error = (dia_pcs != master_pcs).astype(bool)
+            bangle_error = (withchain == 'BANGLE').astype(bool)
+
+            # Messages quote the master values exactly as the reference frame holds them
+            wt_text = reference_unique['DiamondWt'].map('{}'.format).to_numpy()[ref_positions]
+            pcs_text = reference_unique['DiamondPcs'].map('{}'.format).to_numpy()[ref_positions]
+
+            # Join the messages in check order with ', ' (each part carries its separator)
+            joined = (
+                np.where(wt_error, ", Dia Wt doesn't match (±3% tolerance), This is the master diamond weight " + wt_text, '')
+                + np.where(pcs_error, ", Diamond Pieces didn't match, This is the master diamond pieces " + pcs_text, '')
+                + np.where(bangle_error, ', PLEASE CHECK BANGLE SIZE', '')
+            )
+            errors[found] = np.where(joined != '', pd.Series(joined, dtype=object).str[2:], None)
+
         except Exception as e:
             # Log the exception and set an error message in the Error column
-            actual_order_copy.at[index, 'Error'] = f"Error processing row: {str(e)}"
-            logger.error(f"Exception occurred for row {index}: {e}")
+            errors[found] = f"Error processing row: {str(e)}"
+            logger.error(f"Exception occurred while validating rows: {e}")
+
+    errors = pd.Series(errors, index=actual_order_copy.index, dtype=object)
+    wrong_style_code = pd.Series(wrong_style_code, index=actual_order_copy.index)
+    if not actual_order_copy.index.is_unique:
+        # Duplicated labels (exploded SET rows) share the last error written for that label
+        errors = errors.groupby(level=0, sort=False).transform('last')
+        wrong_style_code = wrong_style_code.groupby(level=0, sort=False).transform('max')
+
+    actual_order_copy['Error'] = errors.where(errors.notna(), None)
+    actual_order_copy['wrong_style_code'] = wrong_style_code
     return actual_order_copy 
 
 def adjust_production_delivery_date(df):
@@ -405,7 +529,7 @@ def update_special_remarks_with_article_code(df):
         raise ValueError("DataFrame must contain 'Checking_set', 'SpecialRemarks', and 'Article code' columns.")
 
     # Apply the mapping where 'Checking_set' is 1 and append 'MAKE ONLY {article description}' to 'SpecialRemarks'
-    df.loc[df['Checking_set'] == 1, 'SpecialRemarks'] += df['Article code'].map(
+    df.loc[df['Checking_set'] == 1, 'SpecialRemarks'] += df['Article code'].astype(object).map(
         lambda x: f" MAKE ONLY {article_code_mapping[x]}" if x in article_code_mapping else ''
     ).fillna('')
     return df
@@ -0,0 +1,88 @@
+import os
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Parsed order books are kept as Parquet sidecars named after the input content hash
+CACHE_DIR = os.environ.get('RELIANCE_INPUT_CACHE_DIR', os.path.join(os.getcwd(), 'tmp', 'input_cache'))
+MAX_BYTES = int(os.environ.get('RELIANCE_INPUT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+ENABLED = os.environ.get('RELIANCE_INPUT_CACHE', '1') == '1'
+
+# Bump when the reader output changes so stale sidecars are never served
+CACHE_VERSION = 'v1'
+
+
+def content_key(path, variant=''):
+    """SHA-256 of the file bytes, salted with the reader variant (projection, normalizer)."""
+    digest = hashlib.sha256(f'{CACHE_VERSION}|{variant}|'.encode('utf-8'))
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _sidecar_path(key, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, f'{key}.parquet')
+
+
+def _evict(cache_dir=None, max_bytes=None):
+    # Least recently used first: hits refresh the sidecar's mtime
+    cache_dir = cache_dir or CACHE_DIR
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.parquet'):
+            full = os.path.join(cache_dir, name)
+            stat = os.stat(full)
+            entries.append((stat.st_mtime, stat.st_size, full))
+    total = sum(size for _, size, _ in entries)
+    for _, size, full in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(full)
+            total -= size
+        except OSError as e:
+            logger.error(f"Could not evict input cache entry {full}: {e}")
+
+
+def cached_read(path, read, variant='', cache_dir=None, max_bytes=None):
+    """
+    Return read(path), serving it from a Parquet sidecar keyed by the file content.
+
+    :param path: Input workbook
+    :param read: Callable parsing path into the normalized DataFrame
+    :param variant: Anything that changes read()'s output for the same bytes
+    :param cache_dir: Sidecar folder (defaults to RELIANCE_INPUT_CACHE_DIR)
+    :param max_bytes: Disk budget of the folder (defaults to RELIANCE_INPUT_CACHE_MAX_BYTES)
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    key = content_key(path, variant)
+    sidecar = _sidecar_path(key, cache_dir)
+
+    if os.path.exists(sidecar):
+        try:
+            df = pd.read_parquet(sidecar)
+            os.utime(sidecar)
+            logger.info(f"Input cache hit for {os.path.basename(path)} ({key[:12]}).")
+            # Parquet nulls come back as None; the Excel readers produce NaN
+            return df.where(df.notna(), np.nan)
+        except Exception as e:
+            logger.error(f"Could not read input cache entry {sidecar}: {e}")
+
+    df = read(path)
+    staging = f"{sidecar}.tmp-{os.getpid()}"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        df.to_parquet(staging, index=False)
+        os.replace(staging, sidecar)
+        _evict(cache_dir, max_bytes)
+    except Exception as e:
+        logger.error(f"Could not write input cache entry for {os.path.basename(path)}: {e}")
+        if os.path.exists(staging):
+            os.remove(staging)
+    return df
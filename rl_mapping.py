@@ -133,3 +133,36 @@ RELIANCE_COLUMN_RENAME_MAP = {
     'Target Date': 'Expecteddeliverydate',
     'SKU Number': 'SKUNo'
 }
+
+# Order-book columns the Reliance pipeline reads (after header normalization);
+# the offline readers skip every other column of the export
+RELIANCE_INPUT_COLUMNS = sorted(set(
+    [
+        'Item Id', 'Ext Item Id', 'SKUNo', 'Article code', 'Sub Product Code',
+        'Work Order Id', 'WO Srl', 'Qty.1', 'Item Id Stone', 'Code', 'QUALITY', 'KT',
+        'Pds CW Qty', 'Special Remarks', 'Dia Wt', 'Diamond Pieces',
+    ]
+    + list(RELIANCE_COLUMN_RENAME_MAP)
+    + reliance_required_columns
+))
+
+# Declared dtypes of order-book columns, applied at read time by rl_reader.apply_schema.
+# Weights stay float64 so their rounded sums print exactly; piece counts fit float32;
+# low-cardinality code columns are held as categoricals.
+RELIANCE_INPUT_SCHEMA = {
+    'Qty.1': 'float64',
+    'Dia Wt': 'float64',
+    'Pds CW Qty': 'float32',
+    'Diamond Pieces': 'float32',
+    'Article code': 'category',
+    'Sub Product Code': 'category',
+    'Item Id Stone': 'category',
+    'Work Order Id': 'category',
+    'Indent Name': 'category',
+}
+
+# Item Id Stone -> (weight column, pieces column) totalled per WO Srl by helper_reliance;
+# the fixed set of total columns of every book (other stone types are logged, not totalled)
+STONE_TOTAL_COLUMNS = {
+    'DRD-IGI': ('Dia Wt', 'Diamond Pieces'),
+}
@@ -15,82 +15,60 @@ sys.modules['Clients.reliance.rl_mapping'] = _rl_mapping
 import rl_helper as H
 import rl_mapping as M
 import rl_excelconverter as XL
+from rl_reader import read_order_book, resolve_engine
+from rl_columns import normalize_columns, find_header_row
+import rl_input_cache as INPUT_CACHE
+import rl_stages as STAGES
 
 PRESERVE_ROWS = True
 
 
-def _canon(s: str) -> str:
-    s = '' if s is None else str(s)
-    s = s.replace('\n', ' ')
-    s = ' '.join(s.split())
-    return s.strip()
-
-
-def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    rename = {}
-    for c in list(df.columns):
-        key = _canon(c)
-        key_l = key.lower().replace(' ', '').replace('-', '_')
-        target = None
-        if key_l in {'itemid', 'item_id'}: target = 'Item Id'
-        elif key_l in {'extitemid', 'ext_item_id', 'extitemid.'}: target = 'Ext Item Id'
-        elif key_l in {'skuno', 'sku', 'skunumber', 'sku_no', 'sku.number'}: target = 'SKUNo'
-        elif key_l in {'articlecode', 'article_code'}: target = 'Article code'
-        elif key_l in {'subproductcode', 'sub_product_code'}: target = 'Sub Product Code'
-        elif key_l in {'workorderid', 'work_order_id'}: target = 'Work Order Id'
-        elif key_l in {'wosrl', 'wo_srl', 'wo.serial', 'wo_srno'}: target = 'WO Srl'
-        elif key_l in {'qty.1', 'qty1', 'qty_1'}: target = 'Qty.1'
-        elif key_l in {'itemidstone', 'item_id_stone'}: target = 'Item Id Stone'
-        elif key_l in {'code'}: target = 'Code'
-        elif key_l in {'quality'}: target = 'QUALITY'
-        elif key_l in {'kt', 'karat'}: target = 'KT'
-        if target is None: target = key
-        rename[c] = target
-    out = df.rename(columns=rename)
-    all_nan = [c for c in out.columns if out[c].isna().all()]
-    if all_nan:
-        out = out.drop(columns=all_nan)
-    return out
-
-
-_HEADER_KEYS = {
-    'item id', 'itemid', 'item_id', 'work order id', 'wo srl',
-    'article code', 'sub product code', 'ext item id', 'skuno',
-    'sku', 'trans date', 'qty', 'net qty', 'pure qty',
-    'diamond pieces', 'dia wt', 'quality', 'kt', 'code'
-}
-
-
-def _find_header_row(df_head: pd.DataFrame) -> int | None:
-    best_idx, best_hits = None, 0
-    for i in range(min(len(df_head), 25)):
-        row = df_head.iloc[i].astype(str).tolist()
-        hits = sum(1 for cell in row if (cell or '').lower().strip().replace('  ', ' ') in _HEADER_KEYS)
-        if hits > best_hits:
-            best_hits, best_idx = hits, i
-    return best_idx if best_hits >= 3 else None
-
-
-def _read_mainorder_excel_autodetect(path: str) -> pd.DataFrame:
-    xls = pd.ExcelFile(path, engine='openpyxl')
-    chosen = None
-    for sheet in xls.sheet_names:
-        head = pd.read_excel(xls, sheet_name=sheet, header=None, nrows=25, dtype=str)
-        hdr_idx = _find_header_row(head)
-        if hdr_idx is not None:
-            df = pd.read_excel(xls, sheet_name=sheet, header=hdr_idx, dtype=str)
-            df = _normalize_columns(df)
-            if any(k in df.columns for k in [
-                'Item Id', 'Ext Item Id', 'Work Order Id', 'Article code',
-                'Sub Product Code', 'SKUNo', 'Code', 'QUALITY', 'KT'
-            ]):
-                chosen = df
-                break
-    if chosen is None:
-        df = pd.read_excel(xls, sheet_name=0, dtype=str)
-        chosen = _normalize_columns(df)
-    chosen = chosen.dropna(how='all').reset_index(drop=True)
-    return chosen
+def _read_mainorder_excel_autodetect(path: str, engine: str | None = None,
+                                     columns=M.RELIANCE_INPUT_COLUMNS,
+                                     use_cache: bool = INPUT_CACHE.ENABLED,
+                                     schema=M.RELIANCE_INPUT_SCHEMA) -> pd.DataFrame:
+    def read(p):
+        return read_order_book(p, find_header_row, normalize_columns, engine=engine, columns=columns,
+                               schema=schema)
+
+    if not use_cache:
+        return read(path)
+    # The engines differ in cell types and blank handling, so each caches its own frame
+    variant = resolve_engine(engine) + '|' + (','.join(columns) if columns is not None else '*')
+    if schema:
+        variant += '|' + ','.join(f'{column}:{dtype}' for column, dtype in schema.items())
+    return INPUT_CACHE.cached_read(path, read, variant=variant)
+
+
+READ_WORKERS = int(os.environ.get('RELIANCE_READ_WORKERS', 0)) or None
+
+
+def read_order_books_parallel(paths, max_workers: int | None = READ_WORKERS, on_done=None) -> list:
+    """
+    Read several order books on a process pool (openpyxl parsing holds the GIL).
+
+    Frames are returned in the order of paths. on_done(done, total) is called in
+    the calling process each time a file finishes, e.g. to drive a progress bar.
+    """
+    paths = list(paths)
+    total = len(paths)
+    frames = [None] * total
+    if total <= 1 or max_workers == 1:
+        for i, path in enumerate(paths):
+            frames[i] = _read_mainorder_excel_autodetect(path)
+            if on_done:
+                on_done(i + 1, total)
+        return frames
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    workers = min(total, max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_read_mainorder_excel_autodetect, path): i for i, path in enumerate(paths)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            frames[futures[future]] = future.result()
+            if on_done:
+                on_done(done, total)
+    return frames
 
 
 def _ensure_column(df: pd.DataFrame, name: str, default='') -> pd.DataFrame:
@@ -142,23 +120,8 @@ def ensure_global_special_remarks(df: pd.DataFrame) -> pd.DataFrame:
 # ------------------------------------------------
 
 
-def run_offline(input_xlsx: str, client_name: str = 'Reliance',
-                output_prefix: str = None,
-                style_master_csv: str = None,
-                validator_csv: str = None) -> str:
-    if not os.path.exists(input_xlsx):
-        raise FileNotFoundError(f"Input Excel not found: {input_xlsx}")
-
-    rl_df = _read_mainorder_excel_autodetect(input_xlsx)
-
-    if PRESERVE_ROWS:
-        main = _normalize_columns(rl_df.copy())
-    else:
-        rl_cleaned = H.helper_reliance(rl_df)
-        if not isinstance(rl_cleaned, pd.DataFrame):
-            raise TypeError("helper_reliance() did not return a DataFrame.")
-        main = _normalize_columns(rl_cleaned)
-
+def _derive_columns(main: pd.DataFrame) -> pd.DataFrame:
+    # Metal, KT, tone, size and quality columns read from the Item Id and the order-book columns
     # Fallbacks
     if 'Item Id' not in main.columns and 'Ext Item Id' in main.columns:
         main['Item Id'] = main['Ext Item Id']
@@ -169,9 +132,8 @@ def run_offline(input_xlsx: str, client_name: str = 'Reliance',
 
     # Metal / KT
     itemid_ser = main.get('Item Id', '').astype(str)
-    first_char = itemid_ser.str[0]
-    metal_map = first_char.map(M.mapping_for_quality)
-    main['Metal'] = metal_map.fillna('')
+    decoded = H.decode_item_id(main['Item Id'], main['Article code'] if 'Article code' in main.columns else None)
+    main['Metal'] = decoded['Metal'].cat.add_categories('').fillna('')
 
     main['KT_std'] = main.get('KT', '')
     main['KT_from_metal'] = main['Metal'].apply(_derive_kt_from_text)
@@ -195,12 +157,12 @@ def run_offline(input_xlsx: str, client_name: str = 'Reliance',
     main['KT_final'] = main['KT_std']
     main.loc[main['KT_final'].eq('') & main['KT_from_metal'].ne(''), 'KT_final'] = main['KT_from_metal']
     main.loc[main['KT_final'].eq('') & main['KT_from_itemid'].ne(''), 'KT_final'] = main['KT_from_itemid']
-    main['KT_final'] = main['KT_final'].apply(_norm_kt)
+    main['KT_final'] = main['KT_final'].apply(_norm_kt).astype('category')
 
     # Other computed columns
-    main['Tone'] = itemid_ser.str[15].map(H.map_tone) if len(itemid_ser) else ''
-    main['CustomerProductionInstruction'] = itemid_ser.map(H.generate_customer_productinstruction)
-    main['ItemSize'] = main.apply(H.map_order_group, axis=1)
+    main['Tone'] = decoded['Tone'] if len(itemid_ser) else ''
+    main['CustomerProductionInstruction'] = decoded['CustomerProductionInstruction']
+    main['ItemSize'] = decoded['ItemSize'] if 'ItemSize' in decoded.columns else ''
 
     # Temporary for internal use (will be dropped)
     if 'Work Order Id' in main.columns:
@@ -216,47 +178,82 @@ def run_offline(input_xlsx: str, client_name: str = 'Reliance',
         return f"{kt} {q}".strip()
 
     main['KT_QUALITY'] = [_fmt_kq(k, q) for k, q in zip(main['KT_final'], main['StoneQuality'])]
+    return main
+
+
+def run_offline(input_xlsx: str, client_name: str = 'Reliance',
+                output_prefix: str = None,
+                style_master_csv: str = None,
+                validator_csv: str = None, metrics=None) -> str:
+    if not os.path.exists(input_xlsx):
+        raise FileNotFoundError(f"Input Excel not found: {input_xlsx}")
+
+    if metrics is None:
+        with STAGES.recorder('rl_offline_runner', input=input_xlsx) as metrics:
+            output_file = run_offline(input_xlsx, client_name, output_prefix, style_master_csv, validator_csv,
+                                      metrics=metrics)
+            metrics.emit()
+        return output_file
+    rl_df = metrics.call('read', _read_mainorder_excel_autodetect, input_xlsx)
+
+    base, _ = os.path.splitext(input_xlsx)
+    output_prefix = output_prefix or f"{base}_processed"
+    return run_offline_frame(rl_df, client_name=client_name, output_prefix=output_prefix, metrics=metrics)
+
+
+def run_offline_frame(rl_df: pd.DataFrame, client_name: str = 'Reliance',
+                      output_prefix: str = 'output', sheet_filter=XL.drop_unknown_sheets,
+                      output_format: str = None, metrics=None) -> str:
+    """
+    Process an already-read order book (e.g. merged uploads) and export it; returns the output file.
+
+    :param metrics: rl_stages recorder the stages are recorded on; when omitted, one
+        is made from RELIANCE_STAGE_METRICS and its record is logged at the end
+    """
+    if metrics is None:
+        with STAGES.recorder('rl_offline_runner') as metrics:
+            output_file = run_offline_frame(rl_df, client_name, output_prefix, sheet_filter, output_format,
+                                            metrics=metrics)
+            metrics.emit()
+        return output_file
+    if PRESERVE_ROWS:
+        main = metrics.call('normalize', normalize_columns, rl_df.copy())
+    else:
+        rl_cleaned = metrics.call('helper_reliance', H.helper_reliance, rl_df)
+        if not isinstance(rl_cleaned, pd.DataFrame):
+            raise TypeError("helper_reliance() did not return a DataFrame.")
+        main = metrics.call('normalize', normalize_columns, rl_cleaned)
+
+    main = metrics.call('derive', _derive_columns, main)
 
     # ---- Safeguards & SpecialRemarks (no article code injection) ----
-    main = H.stamping_instruct(main)
-    main = _ensure_column(main, 'Checking_set', 0)
-    main = _ensure_column(main, 'SpecialRemarks', '')
-    main = _ensure_column(main, 'Article code', '')
+    main = metrics.call('stamping', H.stamping_instruct, main)
+    with metrics.stage('remarks', len(main)) as stage:
+        main = _ensure_column(main, 'Checking_set', 0)
+        main = _ensure_column(main, 'SpecialRemarks', '')
+        main = _ensure_column(main, 'Article code', '')
 
-    # ❌ Do NOT call H.update_special_remarks_with_article_code(main)
-    # main = H.update_special_remarks_with_article_code(main)
+        # ❌ Do NOT call H.update_special_remarks_with_article_code(main)
+        # main = H.update_special_remarks_with_article_code(main)
 
-    main = mirror_special_remarks(main)
-    main = ensure_global_special_remarks(main)   # append default note everywhere
+        main = mirror_special_remarks(main)
+        main = ensure_global_special_remarks(main)   # append default note everywhere
 
-    # Ensure both headers exist before rename
-    if 'Special Remarks' not in main.columns and 'SpecialRemarks' in main.columns:
-        main['Special Remarks'] = main['SpecialRemarks']
+        # Ensure both headers exist before rename
+        if 'Special Remarks' not in main.columns and 'SpecialRemarks' in main.columns:
+            main['Special Remarks'] = main['SpecialRemarks']
+        stage.rows_out = len(main)
 
     # Final renames & adjustments
     main.rename(columns=M.RELIANCE_COLUMN_RENAME_MAP, inplace=True)
-    main = H.adjust_production_delivery_date(main)
+    main = metrics.call('dates', H.adjust_production_delivery_date, main)
 
     # Drop JOBWORKNUMBER from final export (and any variants)
     main.drop(columns=[c for c in main.columns if c.strip().upper() == 'JOBWORKNUMBER'],
               inplace=True, errors='ignore')
 
-    # Export
-    base, _ = os.path.splitext(input_xlsx)
-    output_prefix = output_prefix or f"{base}_processed"
-    output_file = XL.process_and_export(main, output_prefix=output_prefix, set_processed=None)
-
-    # Final cleanup: drop any '*unknown*' sheets
-    try:
-        from openpyxl import load_workbook
-        import re as _re
-        wb = load_workbook(output_file)
-        targets = [n for n in wb.sheetnames if 'unknown' in _re.sub(r'\s+', '', n.lower())]
-        if targets and (len(wb.sheetnames) - len(targets)) >= 1:
-            for n in targets:
-                wb.remove(wb[n])
-            wb.save(output_file)
-    except Exception:
-        pass
-
+    # Export, leaving out '*unknown*' sheets
+    with metrics.stage('export', len(main)):
+        output_file = XL.process_and_export(main, output_prefix=output_prefix, set_processed=None,
+                                            sheet_filter=sheet_filter, output_format=output_format)
     return output_file
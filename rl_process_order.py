@@ -1,16 +1,19 @@
 import pandas as pd 
 from rl_helper import (helper_reliance,map_tone,generate_customer_productinstruction
-                                ,map_order_group,split_ext_item_id,
+                                ,map_order_group,decode_item_id,split_ext_item_id,
                                 stamping_instruct,check_style_master,
                                 map_and_add_category_column,process_special_remarks,
                                 validate_order,adjust_production_delivery_date,fill_missing_style_code,
-                                update_special_remarks_with_article_code,convert_excel_to_json
+                                update_special_remarks_with_article_code
                                 )
 from reliance_sql_function import fetch_client_data
+from rl_style_cache import fetch_client_data_cached
 from etl.reliance.rl_status_update import (get_uploads_collection,update_statuses, update_overall_status,fileurl_update,update_client_name,store_sheet_data,
                                            update_orderpunch_status,sqsresponse_update)
-from rl_mapping import mapping_for_quality, RELIANCE_COLUMN_RENAME_MAP
-from rl_excelconverter import process_and_export
+from rl_mapping import mapping_for_quality, RELIANCE_COLUMN_RENAME_MAP, RELIANCE_INPUT_SCHEMA
+from rl_reader import apply_schema
+from rl_excelconverter import process_and_export, sheets_to_json
+import rl_stages as STAGES
 ####from etl.reliance.download_excelfile import process_mainorder_file
 import json
 import traceback
@@ -22,6 +25,21 @@ import os
 import sys
 
 def handle_reliance_client(input_file_path, metadata):
+    """
+    Transform one Reliance order book and export it next to the input.
+
+    With stage metrics on (RELIANCE_STAGE_METRICS=1 or metadata['stage_metrics']),
+    the per-stage record is logged and returned under 'metrics'.
+    """
+    with STAGES.recorder('handle_reliance_client', enabled=metadata.get('stage_metrics'),
+                         document_id=metadata.get('document_id')) as metrics:
+        result = _handle_reliance_client(input_file_path, metadata, metrics)
+        record = metrics.emit()
+    if record is not None:
+        result['metrics'] = record
+    return result
+
+def _handle_reliance_client(input_file_path, metadata, metrics):
     try:
         document_id = metadata.get('document_id')
         logger.info('Started Processing Relaince Order')
@@ -30,7 +48,9 @@ def handle_reliance_client(input_file_path, metadata):
         order_book_type = metadata.get('order_book_type','Regular Order')
         print(f'This the Order book recieved: {order_book_type}')
 
-        reference_df,  additional_df1 = fetch_client_data(client_name)  
+        reference_df,  additional_df1 = metrics.call(
+            'style master', fetch_client_data_cached,
+            client_name, force_refresh=metadata.get('refresh_style_master', False))
                 
         if reference_df.empty:
             logger.error(f"No data found for client {client_name}.")
@@ -40,8 +60,10 @@ def handle_reliance_client(input_file_path, metadata):
         logger.info(f' This is the column name of reference_df {reference_df.columns.tolist()}')
         try:
              # Read the Excel file directly from the given path
-             rl_df = process_mainorder_file(input_file_path, client_name)
-             print(rl_df.head())
+             with metrics.stage('read') as stage:
+                 rl_df = process_mainorder_file(input_file_path, client_name)
+                 rl_df = apply_schema(rl_df, RELIANCE_INPUT_SCHEMA)
+                 stage.rows_out = len(rl_df)
         except Exception as e:
              status = 'DOWNLOAD FAILED'
              error_message = f"Failed to read and process files: {e}"
@@ -51,72 +73,88 @@ def handle_reliance_client(input_file_path, metadata):
                 'message': error_message,
                 'traceback': traceback.format_exc()
             }
-        rl_cleaned = helper_reliance(rl_df)
+        rl_cleaned = metrics.call('helper_reliance', helper_reliance, rl_df)
         logger.info(f"The length of rows in this is {len(rl_cleaned)}")
 
-        rl_cleaned['Metal'] = rl_cleaned['Item Id'].str[0].map(mapping_for_quality)
-        rl_cleaned['Tone'] = rl_cleaned['Item Id'].str.get(15).map(map_tone)
-        rl_cleaned['CustomerProductionInstruction'] = rl_cleaned['Item Id'].map(generate_customer_productinstruction)
-        rl_cleaned['ItemSize'] = rl_cleaned.apply(map_order_group, axis=1)
-        rl_cleaned['JOBWORKNUMBER'] = rl_cleaned['Work Order Id']
+        with metrics.stage('derive', len(rl_cleaned)) as stage:
+            decoded = decode_item_id(rl_cleaned['Item Id'], rl_cleaned['Article code'])
+            rl_cleaned['Metal'] = decoded['Metal']
+            rl_cleaned['Tone'] = decoded['Tone']
+            rl_cleaned['CustomerProductionInstruction'] = decoded['CustomerProductionInstruction']
+            rl_cleaned['ItemSize'] = decoded['ItemSize']
+            rl_cleaned['JOBWORKNUMBER'] = rl_cleaned['Work Order Id']
+            stage.rows_out = len(rl_cleaned)
         
         
-        # Mask to identify 'SET' articles with extensions
-        # mask = (rl_cleaned['Article code'] == 'SET') & (rl_cleaned['Ext Item Id'].str.contains('\+'))
-        mask = (
-                        (
-                            rl_cleaned['Article code'].str.contains('SET', case=False) | 
-                            rl_cleaned['Sub Product Code'].str.contains('SET', case=False)
-                        ) &
-                        (
-                            rl_cleaned['Ext Item Id'].str.contains('\+') | 
-                            rl_cleaned['Ext Item Id'].str.contains(r'\b\w+\s*&\s*\w+\b')
+        with metrics.stage('set split', len(rl_cleaned)) as stage:
+            # Mask to identify 'SET' articles with extensions
+            # mask = (rl_cleaned['Article code'] == 'SET') & (rl_cleaned['Ext Item Id'].str.contains('\+'))
+            mask = (
+                            (
+                                rl_cleaned['Article code'].str.contains('SET', case=False) | 
+                                rl_cleaned['Sub Product Code'].str.contains('SET', case=False)
+                            ) &
+                            (
+                                rl_cleaned['Ext Item Id'].str.contains('\+') | 
+                                rl_cleaned['Ext Item Id'].str.contains(r'\b\w+\s*&\s*\w+\b')
+                            )
                         )
-                    )
-        if mask.any():
-            set_processed = split_ext_item_id(rl_cleaned[mask])
-            set_processed['merged_set'] = 1
-            main = rl_cleaned[~mask].copy()
-            set_processed = stamping_instruct(set_processed)
-            merged_checker = check_style_master(set_processed, reference_df)
-            merged_checker=map_and_add_category_column(merged_checker, reference_df)
-            merged_specialremarks = process_special_remarks(merged_checker)
+            if mask.any():
+                set_processed = split_ext_item_id(rl_cleaned[mask])
+                set_processed['merged_set'] = 1
+                main = rl_cleaned[~mask].copy()
+            else:
+                set_processed = None
+                main = rl_cleaned.copy()
+            main['merged_set'] = 0
+            stage.rows_out = len(main) + (len(set_processed) if set_processed is not None else 0)
+
+        if set_processed is not None:
+            set_processed = metrics.call('stamping', stamping_instruct, set_processed)
+            with metrics.stage('style check', len(set_processed)) as stage:
+                merged_checker = check_style_master(set_processed, reference_df)
+                merged_checker=map_and_add_category_column(merged_checker, reference_df)
+                stage.rows_out = len(merged_checker)
+            merged_specialremarks = metrics.call('remarks', process_special_remarks, merged_checker)
             
 
-            merged_updated_df = validate_order(merged_specialremarks,reference_df)
+            merged_updated_df = metrics.call('validate', validate_order, merged_specialremarks, reference_df)
             merged_updated_df.rename(columns=RELIANCE_COLUMN_RENAME_MAP, inplace=True)
 
 
 
-            merged_final = adjust_production_delivery_date(merged_updated_df)
-            logger.info(merged_final.head())
-            main['merged_set'] = 0
+            merged_final = metrics.call('dates', adjust_production_delivery_date, merged_updated_df)
         else:
             merged_final = None
-            main = rl_cleaned.copy()
-            main['merged_set'] = 0
-        main = stamping_instruct(main)
-        if main['Ext Item Id'].isna().any():
-                main = fill_missing_style_code(main,additional_df1)
-                logger.info('Updated missing value')
-        logger.info(main.head(7))
-        checker = check_style_master(main, reference_df)
-        checker = map_and_add_category_column(checker, reference_df)
-        specialremarks = process_special_remarks(checker)
-        logger.info('UPDATING SPECIAL REMARKS')
-        updated_df = update_special_remarks_with_article_code(specialremarks)
+        main = metrics.call('stamping', stamping_instruct, main)
+        with metrics.stage('style check', len(main)) as stage:
+            if main['Ext Item Id'].isna().any():
+                    main = fill_missing_style_code(main,additional_df1)
+                    logger.info('Updated missing value')
+            checker = check_style_master(main, reference_df)
+            checker = map_and_add_category_column(checker, reference_df)
+            stage.rows_out = len(checker)
+        with metrics.stage('remarks', len(checker)) as stage:
+            specialremarks = process_special_remarks(checker)
+            logger.info('UPDATING SPECIAL REMARKS')
+            updated_df = update_special_remarks_with_article_code(specialremarks)
+            stage.rows_out = len(updated_df)
         
-        updated_df = validate_order(updated_df,reference_df)
+        updated_df = metrics.call('validate', validate_order, updated_df, reference_df)
         updated_df.rename(columns=RELIANCE_COLUMN_RENAME_MAP, inplace=True)
 
-        updated_df = adjust_production_delivery_date(updated_df)
+        updated_df = metrics.call('dates', adjust_production_delivery_date, updated_df)
 
         # Save the processed file in the same directory as the input, appending '_processed' to the filename
         base, ext = os.path.splitext(input_file_path)
         processed_file_path = f"{base}_processed{ext}"
-        uploadfile_name = process_and_export(updated_df, output_prefix=processed_file_path, set_processed=merged_final)
-        logger.info(f"File successfully saved to {uploadfile_name}")
-        json_data = convert_excel_to_json(uploadfile_name)
+        with metrics.stage('export', len(updated_df) + (len(merged_final) if merged_final is not None else 0)):
+            uploadfile_name, sheets = process_and_export(updated_df, output_prefix=processed_file_path,
+                                                         set_processed=merged_final, return_sheets=True,
+                                                         output_format='xlsx')   # uploaded as the workbook
+            logger.info(f"File successfully saved to {uploadfile_name}")
+            # JSON comes from the frames just written; the workbook is not read back
+            json_data = sheets_to_json(sheets)
         if json_data:
             for key, value in json_data.items():
                 print(f"Processed sheet: {key}")
@@ -145,4 +183,7 @@ if __name__ == "__main__":
         print(f"Error parsing metadata JSON: {e}")
         sys.exit(1)
     result = handle_reliance_client(input_file_path, metadata)
+    metrics = result.pop('metrics', None)
     print(result)
+    if metrics is not None:
+        print(json.dumps(metrics, default=str))
@@ -0,0 +1,290 @@
+import os
+import logging
+from itertools import chain, islice
+from collections import deque
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Number of leading rows searched for the header row
+HEADER_PROBE_ROWS = 25
+
+# A sheet is taken as the order book once any of these columns is present
+ORDER_BOOK_KEY_COLUMNS = [
+    'Item Id', 'Ext Item Id', 'Work Order Id', 'Article code',
+    'Sub Product Code', 'SKUNo', 'Code', 'QUALITY', 'KT'
+]
+
+# Cell texts pandas reads as NaN by default (the na_values list of read_csv/read_excel)
+NA_VALUES = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
+
+# 'openpyxl' or 'calamine'; left unset, calamine is used when python-calamine is installed
+EXCEL_ENGINE = os.environ.get('RELIANCE_EXCEL_ENGINE') or None
+
+
+def resolve_engine(engine=None):
+    engine = engine or EXCEL_ENGINE
+    if engine:
+        return engine
+    try:
+        import python_calamine  # noqa: F401
+        return 'calamine'
+    except ImportError:
+        return 'openpyxl'
+
+
+def _convert_openpyxl_value(value, error_codes):
+    # Same conversions as pandas' openpyxl reader
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    if isinstance(value, str) and value in error_codes:
+        return np.nan
+    return value
+
+
+def _iter_sheets_openpyxl(path):
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import ERROR_CODES
+
+    def rows(ws):
+        for values in ws.iter_rows(values_only=True):
+            row = [_convert_openpyxl_value(v, ERROR_CODES) for v in values]
+            while row and row[-1] == '':
+                row.pop()
+            yield row
+
+    wb = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        for ws in wb.worksheets:
+            ws.reset_dimensions()
+            yield ws.title, rows(ws)
+    finally:
+        wb.close()
+
+
+def _convert_calamine_value(value):
+    # Same conversions as pandas' calamine reader
+    from datetime import date, time, timedelta
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    if isinstance(value, date):
+        return pd.Timestamp(value)
+    if isinstance(value, timedelta):
+        return pd.Timedelta(value)
+    if isinstance(value, time):
+        return value
+    return value
+
+
+def _iter_sheets_calamine(path):
+    from python_calamine import CalamineWorkbook
+
+    wb = CalamineWorkbook.from_path(path)
+    for name in wb.sheet_names:
+        sheet = wb.get_sheet_by_name(name)
+        # iter_rows converts a row at a time but starts at the first used cell
+        if sheet.start in (None, (0, 0)):
+            values = sheet.iter_rows()
+        else:
+            values = sheet.to_python(skip_empty_area=False)
+        yield name, ([_convert_calamine_value(v) for v in row] for row in values)
+
+
+def iter_sheet_rows(path, engine=None):
+    """
+    Yield (sheet name, row iterator) for each sheet of the workbook. Rows are
+    converted as they are consumed, so a sheet is read once and only as far as
+    the caller iterates it.
+    """
+    if resolve_engine(engine) == 'calamine':
+        return _iter_sheets_calamine(path)
+    return _iter_sheets_openpyxl(path)
+
+
+def _is_blank(value):
+    # An empty cell as either engine returns it (openpyxl None -> '', calamine '')
+    return value is None or value == ''
+
+
+def _is_blank_row(row):
+    # openpyxl rows are trimmed to [] while calamine keeps them full width
+    return all(_is_blank(value) for value in row)
+
+
+def frame_from_rows(rows, header=None):
+    """
+    Build the DataFrame pandas.read_excel(..., header=header, dtype=str) would
+    return for these sheet rows.
+    """
+    # Trim trailing empty rows and pad every row to the same width
+    last = len(rows)
+    while last and _is_blank_row(rows[last - 1]):
+        last -= 1
+    data = rows[:last]
+    if not data:
+        return pd.DataFrame()
+    width = max(len(row) for row in data)
+    data = [row + [''] * (width - len(row)) if len(row) < width else row for row in data]
+    return TextParser(data, header=header, dtype=str, skip_blank_lines=False).read()
+
+
+def _is_na_cell(value):
+    # A cell read_excel(dtype=str) would turn into NaN
+    if isinstance(value, str):
+        return value == '' or value in NA_VALUES
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _normalized_names(names, normalize_columns):
+    # Run the header through normalize_columns on a one-row frame that has no NaN column
+    probe = pd.DataFrame([['x'] * len(names)], columns=names)
+    return list(normalize_columns(probe).columns)
+
+
+def _read_projected(head, rows, hdr_idx, normalize_columns, columns):
+    """
+    Parse the rows below the header keeping only the cells of the wanted columns.
+    Rows that are empty across the whole sheet width are dropped here, as
+    dropna(how='all') would have done on the full frame.
+    """
+    names = list(frame_from_rows([head[hdr_idx]], header=0).columns)
+    keep = [i for i, name in enumerate(_normalized_names(names, normalize_columns)) if name in columns]
+    keep_names = [names[i] for i in keep]
+
+    data = []
+    for row in chain(head[hdr_idx + 1:], rows):
+        if all(_is_na_cell(value) for value in row):
+            continue
+        width = len(row)
+        data.append([row[i] if i < width else '' for i in keep])
+
+    if not data:
+        return pd.DataFrame(columns=keep_names, dtype=object)
+    return TextParser(data, header=None, names=keep_names, dtype=str, skip_blank_lines=False).read()
+
+
+def apply_schema(df, schema):
+    """
+    Cast the columns named in schema ({column: dtype}) in place and return df.
+    Numeric columns are parsed with pd.to_numeric, so cells that are not numbers
+    become NaN; 'category' columns become categoricals. Absent columns are skipped.
+    """
+    for column, dtype in schema.items():
+        if column not in df.columns:
+            continue
+        if dtype == 'category':
+            df[column] = df[column].astype('category')
+        else:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(dtype)
+    return df
+
+
+def _settled_rows(rows, footer_rows):
+    """
+    Rows of the sheet minus the trailing empty rows and the last footer_rows
+    rows, which are only known once the sheet ends; at most footer_rows rows
+    and one run of empty rows are held back.
+    """
+    held, blanks = deque(), []
+    for row in rows:
+        if _is_blank_row(row):
+            blanks.append(row)
+            continue
+        held.extend(blanks)
+        blanks = []
+        held.append(row)
+        while len(held) > footer_rows:
+            yield held.popleft()
+
+
+def _chunk_frame(data, names, start):
+    width = len(names)
+    data = [row[:width] if len(row) >= width else row + [''] * (width - len(row)) for row in data]
+    df = TextParser(data, header=None, names=names, dtype=str, skip_blank_lines=False).read()
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+
+def iter_order_book_chunks(path, chunk_rows, align_column=None, footer_rows=0, engine=None, schema=None):
+    """
+    Read the first sheet (header on its first row, as pandas.read_excel(path,
+    dtype=str) does) as DataFrames of about chunk_rows rows each, streaming the
+    sheet once. Chunks keep the row labels of the full frame.
+
+    :param align_column: Column whose value runs are never split across chunks;
+        a chunk is extended until the value changes
+    :param footer_rows: Rows at the bottom of the sheet that are never yielded
+    :param schema: Cast each chunk with apply_schema
+    """
+    with closing(iter_sheet_rows(path, engine)) as sheets:
+        first = next(sheets, None)
+        if first is None:
+            return
+        _, rows = first
+        header = next(rows, [])
+        if not header:
+            return
+        # Cells right of the header row have no column name and are not read
+        names = list(frame_from_rows([header], header=0).columns)
+        key = names.index(align_column) if align_column in names else None
+
+        chunk, start = [], 0
+        for row in _settled_rows(rows, footer_rows):
+            if len(chunk) >= chunk_rows:
+                split = key is None or (row[key] if key < len(row) else '') != \
+                    (chunk[-1][key] if key < len(chunk[-1]) else '')
+                if split:
+                    df = _chunk_frame(chunk, names, start)
+                    yield apply_schema(df, schema) if schema else df
+                    chunk, start = [], start + len(chunk)
+            chunk.append(row)
+        if chunk:
+            df = _chunk_frame(chunk, names, start)
+            yield apply_schema(df, schema) if schema else df
+
+
+def read_order_book(path, find_header_row, normalize_columns, engine=None, columns=None, schema=None):
+    """
+    Read the first sheet that looks like an order book, streaming each sheet once.
+
+    The header row is located with find_header_row on the first HEADER_PROBE_ROWS
+    rows already pulled, and the frame is built from those same rows. When
+    columns is given, only the cells whose normalized header is in it are kept;
+    the rest of each row is never parsed into the frame. When schema is given,
+    the columns are cast with apply_schema.
+    """
+    chosen = None
+    with closing(iter_sheet_rows(path, engine)) as sheets:
+        for sheet, rows in sheets:
+            head = list(islice(rows, HEADER_PROBE_ROWS))
+            hdr_idx = find_header_row(frame_from_rows(head))
+            if hdr_idx is None:
+                continue
+            if columns is None:
+                df = frame_from_rows(head + list(rows), header=hdr_idx)
+            else:
+                df = _read_projected(head, rows, hdr_idx, normalize_columns, set(columns))
+            df = normalize_columns(df)
+            if any(k in df.columns for k in ORDER_BOOK_KEY_COLUMNS):
+                logger.info(f"Order book found on sheet '{sheet}' (header row {hdr_idx}).")
+                chosen = df
+                break
+    if chosen is None:
+        with closing(iter_sheet_rows(path, engine)) as sheets:
+            first_rows = next((list(rows) for _, rows in sheets), [])
+        df = normalize_columns(frame_from_rows(first_rows, header=0)).dropna(how='all').reset_index(drop=True)
+    elif columns is not None:
+        # Empty rows were already skipped against the full sheet width
+        df = chosen.reset_index(drop=True)
+    else:
+        df = chosen.dropna(how='all').reset_index(drop=True)
+    return apply_schema(df, schema) if schema else df
@@ -0,0 +1,215 @@
+import os
+import sys
+import json
+import time
+import logging
+import tracemalloc
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Per-stage metrics of every pipeline run; off by default
+ENABLED = os.environ.get('RELIANCE_STAGE_METRICS', '0') == '1'
+
+# Also trace Python allocations per stage (tracemalloc slows pandas code down noticeably)
+TRACE_MEMORY = os.environ.get('RELIANCE_STAGE_TRACE_MEMORY', '0') == '1'
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _rows(value):
+    # Rows of a DataFrame, or of the frames in a tuple (e.g. main and set items)
+    if isinstance(value, tuple):
+        counts = [_rows(v) for v in value]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value.index)
+    return None
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+
+class Stage:
+    """Handle of a running stage; set rows_out once the stage's output is known."""
+
+    def __init__(self, recorder, name, rows_in):
+        self.recorder = recorder
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def __enter__(self):
+        if self.recorder.trace_memory:
+            self._traced, peak = tracemalloc.get_traced_memory()
+            self.recorder._peak = max(self.recorder._peak, peak)
+            tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._started
+        record = self.recorder.stages.get(self.name)
+        if record is None:
+            record = self.recorder.stages[self.name] = {
+                'stage': self.name, 'calls': 0, 'seconds': 0.0, 'rows_in': None, 'rows_out': None}
+        record['calls'] += 1
+        record['seconds'] += seconds
+        # A stage run on several frames (main and set items, chunks) adds their rows up
+        for key, rows in (('rows_in', self.rows_in), ('rows_out', self.rows_out)):
+            if rows is not None:
+                record[key] = (record[key] or 0) + rows
+        if self.recorder.trace_memory:
+            traced, peak = tracemalloc.get_traced_memory()
+            self.recorder._peak = max(self.recorder._peak, peak)
+            record['allocated_mb'] = round(record.get('allocated_mb', 0.0) + (traced - self._traced) / 2 ** 20, 3)
+            record['peak_mb'] = round(max(record.get('peak_mb', 0.0), (peak - self._traced) / 2 ** 20), 3)
+        record['max_rss_mb'] = _max_rss_mb()
+        return False
+
+
+class StageRecorder:
+    """
+    Wall time, rows in and out and memory of the named stages of one pipeline run.
+
+    Each stage records its wall time and the peak resident set size of the process
+    when it ends; with trace_memory, also the Python memory it left allocated and
+    its peak allocation above what was allocated when it started. A stage name
+    used more than once (main and set items, chunks) is added up.
+
+    Used as a context manager, the recorder is closed when the block exits, so
+    tracing started for it stops even when the run fails:
+    `with recorder('run') as metrics: ...`.
+
+    :param run: Name of the pipeline, e.g. 'run_reliance_local'
+    :param trace_memory: Trace allocations with tracemalloc (defaults to RELIANCE_STAGE_TRACE_MEMORY)
+    :param fields: Extra values copied into the record (input file, document id)
+    """
+
+    def __init__(self, run, trace_memory=None, **fields):
+        self.run = run
+        self.fields = fields
+        self.stages = {}
+        self.trace_memory = TRACE_MEMORY if trace_memory is None else trace_memory
+        self._peak = 0
+        self._owns_trace = self.trace_memory and not tracemalloc.is_tracing()
+        if self._owns_trace:
+            tracemalloc.start()
+        self._started = time.perf_counter()
+        self._record = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        """Stop tracemalloc if this recorder started it; safe to call more than once."""
+        if self._owns_trace:
+            self._owns_trace = False
+            tracemalloc.stop()
+
+    def stage(self, name, rows_in=None):
+        """Context manager timing one stage: `with metrics.stage('derive', len(df)) as stage:`."""
+        return Stage(self, name, rows_in)
+
+    def call(self, name, fn, *args, **kwargs):
+        """Run fn as stage `name`; rows in and out are taken from the first argument and the result."""
+        with Stage(self, name, _rows(args[0]) if args else None) as stage:
+            result = fn(*args, **kwargs)
+            stage.rows_out = _rows(result)
+        return result
+
+    def iterate(self, name, iterable):
+        """Yield from iterable, timing each item it produces (e.g. reading chunks) as stage `name`."""
+        iterator = iter(iterable)
+        while True:
+            with Stage(self, name, None) as stage:
+                item = next(iterator, None)
+                stage.rows_out = _rows(item)
+            if item is None:
+                return
+            yield item
+
+    def record(self):
+        """The run's record as a JSON-serializable dict; the first call closes the run."""
+        if self._record is None:
+            seconds = time.perf_counter() - self._started
+            record = {'run': self.run, **self.fields, 'seconds': round(seconds, 3),
+                      'max_rss_mb': _max_rss_mb(), 'stages': []}
+            if self.trace_memory:
+                self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+                record['peak_mb'] = round(self._peak / 2 ** 20, 3)
+            self.close()
+            for stage in self.stages.values():
+                record['stages'].append({**stage, 'seconds': round(stage['seconds'], 4)})
+            self._record = record
+        return self._record
+
+    def emit(self):
+        """Log the record as one JSON line and return it."""
+        record = self.record()
+        logger.info(f"Stage metrics: {json.dumps(record, default=str)}")
+        return record
+
+
+class _NullStage:
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullRecorder:
+    """Recorder used when stage metrics are off: stages run untimed and nothing is recorded."""
+
+    _stage = _NullStage()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def close(self):
+        pass
+
+    def stage(self, name, rows_in=None):
+        return self._stage
+
+    def call(self, name, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    def iterate(self, name, iterable):
+        return iterable
+
+    def record(self):
+        return None
+
+    def emit(self):
+        return None
+
+
+NULL_RECORDER = NullRecorder()
+
+
+def recorder(run, enabled=None, **fields):
+    """StageRecorder for one run, or NULL_RECORDER when stage metrics are off (RELIANCE_STAGE_METRICS)."""
+    if enabled is None:
+        enabled = ENABLED
+    return StageRecorder(run, **fields) if enabled else NULL_RECORDER
@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Where snapshots live and how long they stay fresh (seconds); both can be set per environment
+CACHE_DIR = os.environ.get('RELIANCE_STYLE_CACHE_DIR', os.path.join(os.getcwd(), 'tmp', 'style_cache'))
+DEFAULT_TTL = int(os.environ.get('RELIANCE_STYLE_CACHE_TTL', 6 * 60 * 60))
+
+# Incremental sync: pull only rows past the StyleDate/StyleId watermark, and
+# reconcile deleted styles against the full StyleId list every RECONCILE_EVERY seconds
+INCREMENTAL_SYNC = os.environ.get('RELIANCE_STYLE_INCREMENTAL', '0') == '1'
+RECONCILE_EVERY = int(os.environ.get('RELIANCE_STYLE_RECONCILE_EVERY', 24 * 60 * 60))
+
+# Same ordering as the ORDER BY of the style master query (GrpName is SubGroupPrdctCtg)
+STYLE_MASTER_ORDER = ['LegalName', 'SubGroupPrdctCtg', 'SKUNo']
+
+META_FILE = 'meta.json'
+
+
+def _client_dir(client_name, cache_dir=None):
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '_', str(client_name)).strip('_') or 'default'
+    return os.path.join(cache_dir or CACHE_DIR, slug)
+
+
+def _frame_file(index):
+    return f'frame_{index}.parquet'
+
+
+def read_meta(client_name, cache_dir=None):
+    """Return the snapshot metadata for client_name, or None when there is no snapshot."""
+    meta_path = os.path.join(_client_dir(client_name, cache_dir), META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Could not read style master snapshot metadata for {client_name}: {e}")
+        return None
+
+
+def _watermark(style_master):
+    """Highest StyleDate / StyleId held in the style master, as JSON-friendly values."""
+    watermark = {'StyleDate': None, 'StyleId': None}
+    if 'StyleDate' in style_master.columns:
+        latest = pd.to_datetime(style_master['StyleDate'], errors='coerce').max()
+        if pd.notna(latest):
+            watermark['StyleDate'] = latest.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    if 'StyleId' in style_master.columns:
+        latest = pd.to_numeric(style_master['StyleId'], errors='coerce').max()
+        if pd.notna(latest):
+            watermark['StyleId'] = int(latest) if float(latest).is_integer() else float(latest)
+    return watermark
+
+
+def read_snapshot(client_name, ttl=None, cache_dir=None):
+    """
+    Load the cached frames for client_name.
+
+    Returns the tuple of DataFrames as fetch_client_data returned it, or None when
+    there is no snapshot or it is older than ttl seconds (ttl=0 disables expiry).
+    """
+    ttl = DEFAULT_TTL if ttl is None else ttl
+    path = _client_dir(client_name, cache_dir)
+    meta = read_meta(client_name, cache_dir)
+    if meta is None:
+        return None
+    try:
+        age = time.time() - meta['fetched_at']
+        if ttl and age > ttl:
+            logger.info(f"Style master snapshot for {client_name} expired ({age:.0f}s old).")
+            return None
+        frames = tuple(pd.read_parquet(os.path.join(path, _frame_file(i))) for i in range(meta['frames']))
+        logger.info(f"Loaded style master snapshot for {client_name} ({age:.0f}s old).")
+        return frames
+    except Exception as e:
+        logger.error(f"Could not read style master snapshot for {client_name}: {e}")
+        return None
+
+
+def write_snapshot(client_name, frames, cache_dir=None, reconciled_at=None, fetched_at=None):
+    """
+    Store the frames returned by fetch_client_data for client_name, together with
+    the StyleDate/StyleId watermark of the style master (the first frame).
+    The snapshot is written to a staging folder and swapped in, so readers never see
+    a partial copy. Returns True when the snapshot was written.
+
+    :param fetched_at: Time of the full fetch the frames come from; a delta sync
+        passes the snapshot's own so the TTL still counts from the last full fetch
+        (the sync time is kept as synced_at)
+    """
+    path = _client_dir(client_name, cache_dir)
+    staging = f"{path}.tmp-{os.getpid()}"
+    try:
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for i, frame in enumerate(frames):
+            frame.to_parquet(os.path.join(staging, _frame_file(i)), index=False)
+        written_at = time.time()
+        fetched_at = fetched_at or written_at
+        with open(os.path.join(staging, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'client_name': client_name, 'frames': len(frames),
+                       'rows': [len(frame) for frame in frames], 'fetched_at': fetched_at,
+                       'synced_at': written_at, 'reconciled_at': reconciled_at or fetched_at,
+                       'watermark': _watermark(frames[0])}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(staging, path)
+        return True
+    except Exception as e:
+        logger.error(f"Could not write style master snapshot for {client_name}: {e}")
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+
+
+def sync_client_data(client_name, reconcile_every=None, cache_dir=None,
+                     delta_fetcher=None, ids_fetcher=None, ttl=None):
+    """
+    Bring the local style master snapshot up to date with only the rows past its
+    StyleDate/StyleId watermark, merged by StyleId.
+
+    Deleted styles are dropped by comparing against the full StyleId list once the
+    last reconciliation is older than reconcile_every seconds. The validator frames
+    are kept as cached; they are refreshed with the next full fetch, which is due
+    once the snapshot's last full fetch is older than ttl seconds.
+    Returns the synced frames, or None when there is no snapshot to sync or a full
+    fetch is due.
+    """
+    reconcile_every = RECONCILE_EVERY if reconcile_every is None else reconcile_every
+    meta = read_meta(client_name, cache_dir)
+    frames = read_snapshot(client_name, ttl=ttl, cache_dir=cache_dir)
+    if meta is None or frames is None or 'watermark' not in meta:
+        return None
+
+    if delta_fetcher is None:
+        from reliance_sql_function import fetch_style_master_delta as delta_fetcher
+    if ids_fetcher is None:
+        from reliance_sql_function import fetch_style_ids as ids_fetcher
+
+    style_master = frames[0]
+    watermark = meta['watermark']
+    delta = delta_fetcher(client_name, since_date=watermark['StyleDate'], since_id=watermark['StyleId'])
+    if not delta.empty:
+        unchanged = ~style_master['StyleId'].isin(delta['StyleId'])
+        style_master = pd.concat([style_master[unchanged], delta], ignore_index=True)
+    logger.info(f"Style master delta for {client_name}: {len(delta)} rows.")
+
+    reconciled_at = meta.get('reconciled_at', meta['fetched_at'])
+    reconciled = time.time() - reconciled_at > reconcile_every
+    if reconciled:
+        live_ids = ids_fetcher(client_name)
+        deleted = ~style_master['StyleId'].isin(live_ids)
+        style_master = style_master[~deleted]
+        reconciled_at = time.time()
+        logger.info(f"Reconciled style master for {client_name}: {int(deleted.sum())} deleted styles dropped.")
+
+    if delta.empty and not reconciled:
+        return frames
+
+    order = [col for col in STYLE_MASTER_ORDER if col in style_master.columns]
+    if order:
+        style_master = style_master.sort_values(order, kind='stable')
+    frames = (style_master.reset_index(drop=True), *frames[1:])
+    write_snapshot(client_name, frames, cache_dir=cache_dir, reconciled_at=reconciled_at,
+                   fetched_at=meta['fetched_at'])
+    return frames
+
+
+def fetch_client_data_cached(client_name, ttl=None, force_refresh=False, cache_dir=None, fetcher=None,
+                             incremental=None, delta_fetcher=None, ids_fetcher=None):
+    """
+    Drop-in replacement for fetch_client_data that serves the style master and
+    validator frames from a local Parquet snapshot while it is fresh.
+
+    :param client_name: Client whose data is fetched; also the snapshot key
+    :param ttl: Snapshot lifetime in seconds (defaults to RELIANCE_STYLE_CACHE_TTL)
+    :param force_refresh: Skip the snapshot and query the database
+    :param cache_dir: Snapshot root folder (defaults to RELIANCE_STYLE_CACHE_DIR)
+    :param fetcher: Callable used on a miss (defaults to fetch_client_data)
+    :param incremental: Delta-sync an existing snapshot on every call between full
+        fetches, which still happen once the TTL has passed (defaults to
+        RELIANCE_STYLE_INCREMENTAL)
+    :return: Same tuple of DataFrames as fetch_client_data
+    """
+    incremental = INCREMENTAL_SYNC if incremental is None else incremental
+    if incremental and not force_refresh:
+        frames = sync_client_data(client_name, cache_dir=cache_dir, delta_fetcher=delta_fetcher,
+                                  ids_fetcher=ids_fetcher, ttl=ttl)
+        if frames is not None:
+            return frames
+
+    if not force_refresh:
+        frames = read_snapshot(client_name, ttl=ttl, cache_dir=cache_dir)
+        if frames is not None:
+            return frames
+
+    if fetcher is None:
+        from reliance_sql_function import fetch_client_data as fetcher
+    frames = fetcher(client_name)
+
+    # Never cache a failed or empty fetch
+    if frames and not frames[0].empty:
+        write_snapshot(client_name, frames, cache_dir=cache_dir)
+    return frames
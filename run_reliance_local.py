@@ -1,6 +1,10 @@
 
 import argparse
-import sys, types, os, json
+import sys, types, os, json, glob, time
+import logging
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
 
 # --- Module path alias so rl_excelconverter can import 'Clients.reliance.rl_mapping' ---
@@ -17,10 +21,19 @@ sys.modules['Clients.reliance.rl_mapping'] = _rl_mapping
 import rl_helper as H
 import rl_mapping as M
 import rl_excelconverter as XL
+import rl_stages as STAGES
+from rl_reader import apply_schema, iter_order_book_chunks
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Rows per chunk in streaming mode (--chunk-rows) when no size is given; chunks are
+# extended to the end of a WO Srl. Only sizes the chunks, never turns streaming on.
+CHUNK_ROWS = int(os.environ.get('RELIANCE_CHUNK_ROWS', 20000))
 
 def read_mainorder_file(path: str) -> pd.DataFrame:
-    """Read the Reliance main order Excel (first sheet)."""
-    return pd.read_excel(path, sheet_name=0, dtype=str)
+    """Read the Reliance main order Excel (first sheet), typed by RELIANCE_INPUT_SCHEMA."""
+    return apply_schema(pd.read_excel(path, sheet_name=0, dtype=str), M.RELIANCE_INPUT_SCHEMA)
 
 def load_style_master_csv(path: str) -> pd.DataFrame:
     df = pd.read_csv(path)
@@ -40,35 +53,54 @@ def ensure_column(df, name, default=''):
         df[name] = default
     return df
 
-def run_offline(input_xlsx: str, client_name: str, output_prefix: str = None,
-                style_master_csv: str = None, validator_csv: str = None):
-    # 1) Load input order book
-    rl_df = read_mainorder_file(input_xlsx)
-
-    # 2) Clean / aggregate diamonds, dedupe WO Srl
-    rl_cleaned = H.helper_reliance(rl_df)
+def _process_branch(df, metrics, style_check, remarks, validate):
+    # Stamping, style checks, remarks and validation of the main or the set items, one stage each
+    df = metrics.call('stamping', H.stamping_instruct, df)
+    with metrics.stage('style check', len(df)) as stage:
+        for step in style_check:
+            df = step(df)
+        stage.rows_out = len(df)
+    with metrics.stage('remarks', len(df)) as stage:
+        for step in remarks:
+            df = step(df)
+        stage.rows_out = len(df)
+    df = metrics.call('validate', validate, df)
+    df.rename(columns=M.RELIANCE_COLUMN_RENAME_MAP, inplace=True)
+    return metrics.call('dates', H.adjust_production_delivery_date, df)
 
+def _process_order_frame(rl_cleaned: pd.DataFrame, style_master: pd.DataFrame = None,
+                         validator: pd.DataFrame = None, metrics=STAGES.NULL_RECORDER):
+    """
+    Derived columns, SET split, style checks, remarks and validation for rows that
+    went through helper_reliance. Returns (main items, set items or None).
+    """
     # 3) Basic derived columns
-    rl_cleaned['Metal'] = rl_cleaned['Item Id'].str[0].map(M.mapping_for_quality)
-    rl_cleaned['Tone'] = rl_cleaned['Item Id'].str.get(15).map(H.map_tone)
-    rl_cleaned['CustomerProductionInstruction'] = rl_cleaned['Item Id'].map(H.generate_customer_productinstruction)
-    rl_cleaned['ItemSize'] = rl_cleaned.apply(H.map_order_group, axis=1)
-    rl_cleaned['JOBWORKNUMBER'] = rl_cleaned.get('Work Order Id', rl_cleaned.get('Work Order Id ', ''))
+    with metrics.stage('derive', len(rl_cleaned)) as stage:
+        decoded = H.decode_item_id(rl_cleaned['Item Id'], rl_cleaned.get('Article code'))
+        rl_cleaned['Metal'] = decoded['Metal']
+        rl_cleaned['Tone'] = decoded['Tone']
+        rl_cleaned['CustomerProductionInstruction'] = decoded['CustomerProductionInstruction']
+        rl_cleaned['ItemSize'] = decoded['ItemSize'] if 'ItemSize' in decoded.columns else ''
+        rl_cleaned['JOBWORKNUMBER'] = rl_cleaned.get('Work Order Id', rl_cleaned.get('Work Order Id ', ''))
+        stage.rows_out = len(rl_cleaned)
 
     # 4) Split SETs if Ext Item Id contains '+' or '<a & b>' pattern
-    mask = (
-        (rl_cleaned['Article code'].astype(str).str.contains('SET', case=False) |
-         rl_cleaned['Sub Product Code'].astype(str).str.contains('SET', case=False)) &
-        (rl_cleaned['Ext Item Id'].astype(str).str.contains('\+') |
-         rl_cleaned['Ext Item Id'].astype(str).str.contains(r'\b\w+\s*&\s*\w+\b'))
-    )
-
-    style_master = None
-    validator = None
-    if style_master_csv and os.path.exists(style_master_csv):
-        style_master = load_style_master_csv(style_master_csv)
-    if validator_csv and os.path.exists(validator_csv):
-        validator = load_validator_csv(validator_csv)
+    with metrics.stage('set split', len(rl_cleaned)) as stage:
+        mask = (
+            (rl_cleaned['Article code'].astype(str).str.contains('SET', case=False) |
+             rl_cleaned['Sub Product Code'].astype(str).str.contains('SET', case=False)) &
+            (rl_cleaned['Ext Item Id'].astype(str).str.contains('\+') |
+             rl_cleaned['Ext Item Id'].astype(str).str.contains(r'\b\w+\s*&\s*\w+\b'))
+        )
+        if mask.any():
+            set_processed = rl_cleaned[mask].copy()
+            set_processed['merged_set'] = 1
+            main = rl_cleaned[~mask].copy()
+        else:
+            set_processed = None
+            main = rl_cleaned.copy()
+        main['merged_set'] = 0
+        stage.rows_out = len(main) + (len(set_processed) if set_processed is not None else 0)
 
     def safe_check_style_master(df):
         if style_master is None:
@@ -96,51 +128,262 @@ def run_offline(input_xlsx: str, client_name: str, output_prefix: str = None,
             return df
         return H.validate_order(df, style_master.rename(columns=lambda c: c))
 
-    if mask.any():
-        set_processed = rl_cleaned[mask].copy()
-        set_processed['merged_set'] = 1
-        main = rl_cleaned[~mask].copy()
-        set_processed = H.stamping_instruct(set_processed)
-        set_processed = safe_check_style_master(set_processed)
-        set_processed = safe_map_and_add_category(set_processed)
-        set_processed = H.process_special_remarks(set_processed)
-        set_processed = safe_validate(set_processed)
-        set_processed.rename(columns=M.RELIANCE_COLUMN_RENAME_MAP, inplace=True)
-        merged_final = H.adjust_production_delivery_date(set_processed)
-        main['merged_set'] = 0
-    else:
-        merged_final = None
-        main = rl_cleaned.copy()
-        main['merged_set'] = 0
+    if set_processed is not None:
+        set_processed = _process_branch(set_processed, metrics,
+                                        style_check=[safe_check_style_master, safe_map_and_add_category],
+                                        remarks=[H.process_special_remarks], validate=safe_validate)
 
     # Main branch
-    main = H.stamping_instruct(main)
-    main = safe_fill_missing_style_code(main)
-    main = safe_check_style_master(main)
-    main = safe_map_and_add_category(main)
-    main = H.process_special_remarks(main)
-    main = H.update_special_remarks_with_article_code(main)
-    main = safe_validate(main)
-    main.rename(columns=M.RELIANCE_COLUMN_RENAME_MAP, inplace=True)
-    main = H.adjust_production_delivery_date(main)
+    main = _process_branch(main, metrics,
+                           style_check=[safe_fill_missing_style_code, safe_check_style_master,
+                                        safe_map_and_add_category],
+                           remarks=[H.process_special_remarks, H.update_special_remarks_with_article_code],
+                           validate=safe_validate)
+
+    return main, set_processed
+
+def _load_reference_frames(style_master_csv, validator_csv, style_master, validator):
+    # Preloaded frames (batch mode) take precedence over the CSV paths
+    if style_master is None and style_master_csv and os.path.exists(style_master_csv):
+        style_master = load_style_master_csv(style_master_csv)
+    if validator is None and validator_csv and os.path.exists(validator_csv):
+        validator = load_validator_csv(validator_csv)
+    return style_master, validator
+
+def run_offline(input_xlsx: str, client_name: str, output_prefix: str = None,
+                style_master_csv: str = None, validator_csv: str = None,
+                style_master: pd.DataFrame = None, validator: pd.DataFrame = None,
+                output_format: str = None, metrics=None):
+    """
+    Process one order book offline and export it; returns the output path.
+
+    :param metrics: rl_stages recorder the stages are recorded on; when omitted, one
+        is made from RELIANCE_STAGE_METRICS and its record is logged at the end
+    """
+    if metrics is None:
+        with STAGES.recorder('run_reliance_local', input=input_xlsx) as metrics:
+            output_file = run_offline(input_xlsx, client_name, output_prefix, style_master_csv, validator_csv,
+                                      style_master, validator, output_format, metrics=metrics)
+            metrics.emit()
+        return output_file
+    style_master, validator = _load_reference_frames(style_master_csv, validator_csv, style_master, validator)
+
+    # 1) Load input order book
+    rl_df = metrics.call('read', read_mainorder_file, input_xlsx)
+
+    # 2) Clean / aggregate diamonds, dedupe WO Srl
+    rl_cleaned = metrics.call('helper_reliance', H.helper_reliance, rl_df)
+
+    # 3) Derived columns, SET split, checks and remarks
+    main, merged_final = _process_order_frame(rl_cleaned, style_master, validator, metrics)
 
     # Output
     base, ext = os.path.splitext(input_xlsx)
     output_prefix = output_prefix or f"{base}_processed"
-    output_file = XL.process_and_export(main, output_prefix=output_prefix, set_processed=merged_final)
+    with metrics.stage('export', len(main) + (len(merged_final) if merged_final is not None else 0)):
+        output_file = XL.process_and_export(main, output_prefix=output_prefix, set_processed=merged_final,
+                                            output_format=output_format)
     return output_file
 
+def _scan_book(input_xlsx: str, chunk_rows: int, threshold: float = 0.99):
+    """
+    First pass over the book: the columns helper_reliance keeps, decided over the
+    whole book, and whether the rows of every WO Srl are contiguous, which the
+    chunked pass needs to total a WO Srl's stones as run_offline does.
+    Returns (kept columns, contiguous).
+    """
+    counts, total = None, 0
+    started, previous, contiguous = set(), None, True
+    for chunk in iter_order_book_chunks(input_xlsx, chunk_rows, footer_rows=4, schema=M.RELIANCE_INPUT_SCHEMA):
+        chunk_counts = chunk.notna().sum()
+        counts = chunk_counts if counts is None else counts + chunk_counts
+        total += len(chunk)
+        if contiguous and len(chunk) and 'WO Srl' in chunk.columns:
+            # Values that start a run of WO Srl rows (empty cells as None, so that
+            # a run of them is one run); one seen starting before has come back
+            srl = chunk['WO Srl'].astype(object)
+            values = srl.where(srl.notna(), None).to_numpy()
+            before = np.concatenate([[previous], values[:-1]])
+            starts = values[values != before].tolist()
+            contiguous = len(set(starts)) == len(starts) and started.isdisjoint(starts)
+            started.update(starts)
+            previous = values[-1]
+    if counts is None:
+        return [], contiguous
+    return list(counts.index[counts >= total * (1 - threshold)]), contiguous
+
+def run_offline_streaming(input_xlsx: str, client_name: str, output_prefix: str = None,
+                          style_master_csv: str = None, validator_csv: str = None,
+                          style_master: pd.DataFrame = None, validator: pd.DataFrame = None,
+                          chunk_rows: int = None, metrics=None):
+    """
+    run_offline for order books too large to hold at once, writing the same workbook.
+
+    The book is read in chunks of about chunk_rows rows that never split a WO Srl;
+    each chunk goes through helper_reliance and the rest of the pipeline and its
+    sheets are spooled to disk (XL.SheetSpool), so peak memory follows the chunk
+    size rather than the book. The sheet is read twice: once to decide which
+    columns helper_reliance keeps, once to process it. A WO Srl's stones are
+    totalled within its chunk, so the rows of each WO Srl must be contiguous, as
+    in Reliance exports; when the first pass finds a WO Srl whose rows come back
+    further down, the book is run through run_offline instead, with a warning.
+    Output is always xlsx.
+    Stages add up over the chunks (see run_offline for metrics); the first pass
+    is recorded as 'scan columns', the chunked read as 'read'.
+    """
+    chunk_rows = chunk_rows or CHUNK_ROWS
+    if metrics is None:
+        with STAGES.recorder('run_reliance_local', input=input_xlsx, chunk_rows=chunk_rows) as metrics:
+            output_file = run_offline_streaming(input_xlsx, client_name, output_prefix, style_master_csv,
+                                                validator_csv, style_master, validator, chunk_rows, metrics=metrics)
+            metrics.emit()
+        return output_file
+    style_master, validator = _load_reference_frames(style_master_csv, validator_csv, style_master, validator)
+    with metrics.stage('scan columns'):
+        keep_columns, contiguous = _scan_book(input_xlsx, chunk_rows)
+    if not contiguous:
+        logger.warning(f"{input_xlsx}: rows of a WO Srl are not contiguous; reading the whole book instead of streaming")
+        return run_offline(input_xlsx, client_name, output_prefix, style_master=style_master,
+                           validator=validator, output_format='xlsx', metrics=metrics)
+
+    base, ext = os.path.splitext(input_xlsx)
+    spool = XL.SheetSpool(output_prefix or f"{base}_processed")
+    try:
+        chunks = iter_order_book_chunks(input_xlsx, chunk_rows, align_column='WO Srl', footer_rows=4,
+                                        schema=M.RELIANCE_INPUT_SCHEMA)
+        for chunk in metrics.iterate('read', chunks):
+            rl_cleaned = metrics.call('helper_reliance', H.helper_reliance, chunk,
+                                      footer_rows=0, keep_columns=keep_columns)
+            main, merged_final = _process_order_frame(rl_cleaned, style_master, validator, metrics)
+            with metrics.stage('export', len(main) + (len(merged_final) if merged_final is not None else 0)):
+                spool.add(main, merged_final)
+        with metrics.stage('export'):
+            output_file = spool.close()
+    finally:
+        spool.discard()
+    return output_file
+
+def list_batch_inputs(pattern: str) -> list:
+    """Order books of a batch: every .xlsx in a directory, or the files matching a glob."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.xlsx')
+    paths = sorted(glob.glob(pattern))
+    # Skip Excel lock files and outputs of earlier runs
+    return [p for p in paths
+            if not os.path.basename(p).startswith('~$') and not p.endswith('_processed.xlsx')]
+
+# Style master / validator shared by every file a batch worker processes
+_batch_style_master = None
+_batch_validator = None
+
+def _init_batch_worker(style_master, validator):
+    global _batch_style_master, _batch_validator
+    _batch_style_master, _batch_validator = style_master, validator
+
+def _run_batch_item(input_xlsx: str, client_name: str, output_dir: str = None,
+                    output_format: str = None, metrics_enabled: bool = None) -> dict:
+    started = time.perf_counter()
+    metrics = STAGES.recorder('run_reliance_local', enabled=metrics_enabled, input=input_xlsx)
+    try:
+        output_prefix = None
+        if output_dir:
+            base = os.path.splitext(os.path.basename(input_xlsx))[0]
+            output_prefix = os.path.join(output_dir, f"{base}_processed")
+        # stdout carries the batch's JSON lines; progress prints go to stderr
+        with redirect_stdout(sys.stderr):
+            out = run_offline(input_xlsx, client_name, output_prefix,
+                              style_master=_batch_style_master, validator=_batch_validator,
+                              output_format=output_format, metrics=metrics)
+        result = {"status": "success", "input_file": input_xlsx, "output_file": out,
+                  "seconds": round(time.perf_counter() - started, 3)}
+    except Exception as e:
+        result = {"status": "error", "input_file": input_xlsx, "message": str(e),
+                  "seconds": round(time.perf_counter() - started, 3)}
+    record = metrics.record()
+    if record is not None:
+        result["metrics"] = record
+    return result
+
+def run_batch(pattern: str, client_name: str, style_master_csv: str = None, validator_csv: str = None,
+              output_dir: str = None, workers: int = None, emit=print, output_format: str = None,
+              metrics_enabled: bool = None) -> list:
+    """
+    Process every order book matched by pattern on a shared process pool.
+    The style master and validator are loaded once and handed to each worker at start-up;
+    emit receives one JSON line per file as it finishes, with the file's stage
+    metrics under "metrics" when they are on (metrics_enabled or RELIANCE_STAGE_METRICS),
+    or a single {"status": "empty"} line when pattern matches no order book.
+    """
+    paths = list_batch_inputs(pattern)
+    if not paths:
+        logger.warning(f"No order books match {pattern}")
+        emit(json.dumps({"status": "empty", "pattern": pattern}))
+        return []
+    style_master = load_style_master_csv(style_master_csv) if style_master_csv and os.path.exists(style_master_csv) else None
+    validator = load_validator_csv(validator_csv) if validator_csv and os.path.exists(validator_csv) else None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    workers = min(len(paths), workers or os.cpu_count() or 1) or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                             initargs=(style_master, validator)) as pool:
+        futures = [pool.submit(_run_batch_item, p, client_name, output_dir, output_format, metrics_enabled)
+                   for p in paths]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            emit(json.dumps(result))
+    return results
+
 def main():
     p = argparse.ArgumentParser(description="Offline runner for Reliance order processing (no DB).")
-    p.add_argument('--input', required=True, help='Path to Reliance order Excel (.xlsx)')
+    source = p.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help='Path to Reliance order Excel (.xlsx)')
+    source.add_argument('--batch', help='Directory of order books, or a glob such as "orders/*.xlsx"')
     p.add_argument('--client', default='Reliance', help='Client name (default: Reliance)')
     p.add_argument('--output-prefix', default=None, help='Output file prefix (without .xlsx)')
+    p.add_argument('--output-dir', default=None, help='Batch mode: folder for the processed files (default: next to each input)')
+    p.add_argument('--workers', type=int, default=None, help='Batch mode: worker processes (default: CPU count)')
+    p.add_argument('--output-format', default=None, choices=list(XL.OUTPUT_BACKENDS),
+                   help='Output backend (default: RELIANCE_OUTPUT_FORMAT or xlsx); non-xlsx formats write a folder per file')
+    p.add_argument('--chunk-rows', type=int, nargs='?', const=CHUNK_ROWS, default=None,
+                   help='Stream the order book in chunks of about this many rows (xlsx output only; '
+                        'without a value: RELIANCE_CHUNK_ROWS or 20000)')
     p.add_argument('--style-master', default=None, help='Optional CSV with style master (PartyStyleMst projection)')
     p.add_argument('--validator', default=None, help='Optional CSV with RRLDsgCd→AuraDsgCd mapping')
+    p.add_argument('--metrics', action='store_true',
+                   help='Print per-stage timing as a JSON line after the status line (or set RELIANCE_STAGE_METRICS=1)')
     args = p.parse_args()
+    xlsx_output = (args.output_format or XL.OUTPUT_FORMAT) in ('xlsx', 'xlsx-stream')
+    if args.chunk_rows is not None and (args.batch or not xlsx_output):
+        p.error('--chunk-rows works with --input and xlsx output only')
+    if args.chunk_rows is not None and args.chunk_rows < 1:
+        p.error('--chunk-rows must be a positive number of rows')
+    chunk_rows = args.chunk_rows
 
-    out = run_offline(args.input, args.client, args.output_prefix, args.style_master, args.validator)
+    if args.batch:
+        results = run_batch(args.batch, args.client, args.style_master, args.validator,
+                            output_dir=args.output_dir, workers=args.workers,
+                            emit=lambda line: print(line, flush=True), output_format=args.output_format,
+                            metrics_enabled=args.metrics or None)
+        # An empty batch is a failure for the scheduler, as a failed file is
+        if not results or any(r["status"] != "success" for r in results):
+            sys.exit(1)
+        return
+
+    fields = {'chunk_rows': chunk_rows} if chunk_rows else {}
+    metrics = STAGES.recorder('run_reliance_local', enabled=args.metrics or None, input=args.input, **fields)
+    if chunk_rows:
+        out = run_offline_streaming(args.input, args.client, args.output_prefix, args.style_master,
+                                    args.validator, chunk_rows=chunk_rows, metrics=metrics)
+    else:
+        out = run_offline(args.input, args.client, args.output_prefix, args.style_master, args.validator,
+                          output_format=args.output_format, metrics=metrics)
     print(json.dumps({"status": "success", "output_file": out}))
+    record = metrics.record()
+    if record is not None:
+        print(json.dumps(record))
 
 if __name__ == '__main__':
     main()
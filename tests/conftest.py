@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Every read goes to the workbook, never to a Parquet sidecar left by another run
+os.environ['RELIANCE_INPUT_CACHE'] = '0'
+
+# Installs the Clients.reliance.rl_mapping alias rl_excelconverter imports from
+import run_reliance_local  # noqa: E402,F401
+from benchmarks import synthetic  # noqa: E402
+
+# Small enough to keep the suite quick, large enough for every article, SET lines and several stones per WO Srl
+FIXTURE_ROWS = 400
+
+
+@pytest.fixture(scope='session')
+def fixture_book(tmp_path_factory):
+    """Synthetic order book with its style master and validator CSVs (benchmarks.synthetic)."""
+    return synthetic.write_inputs(FIXTURE_ROWS, str(tmp_path_factory.mktemp('book')), seed=7)
+
+
+@pytest.fixture(scope='session')
+def unsorted_book(tmp_path_factory, fixture_book):
+    """The fixture book with its order rows shuffled, so the rows of a WO Srl are scattered."""
+    book = synthetic.order_book(FIXTURE_ROWS, seed=7)
+    shuffled = book.sample(frac=1, random_state=0).reset_index(drop=True)
+    path = os.path.join(str(tmp_path_factory.mktemp('unsorted')), 'orders_unsorted.xlsx')
+    return dict(fixture_book, order_book=synthetic.write_order_book(shuffled, path))
@@ -0,0 +1,78 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import rl_db
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = rl_db.ConnectionPool(rl_db.sqlite_driver(str(tmp_path / 'aura.db')), size=2)
+    with pool.connection() as conn:
+        conn.execute('Create Table Styles (StyleId Integer, StyleCode Text, DiamondWt Real)')
+        conn.executemany('Insert Into Styles Values (?, ?, ?)',
+                         [(i, f'W-LRB{i:05d}', i / 8) for i in range(1, 11)])
+        conn.commit()
+    yield pool
+    pool.close()
+
+
+def test_read_frame_binds_parameters(pool):
+    frame = rl_db.read_frame('Select * From Styles Where StyleId > %s And StyleCode Like %s Order By StyleId',
+                             (7, 'W-LRB%'), pool=pool)
+    assert frame['StyleId'].tolist() == [8, 9, 10]
+    assert frame.columns.tolist() == ['StyleId', 'StyleCode', 'DiamondWt']
+
+    # A quote in a value is data, not SQL
+    frame = rl_db.read_frame('Select * From Styles Where StyleCode = %s', ("x' Or '1'='1",), pool=pool)
+    assert frame.empty
+
+
+@pytest.mark.parametrize('chunksize', [1, 3, 10, 50])
+def test_chunked_read_matches_whole_read(pool, chunksize):
+    query = 'Select * From Styles Order By StyleId'
+    pd.testing.assert_frame_equal(rl_db.read_frame(query, chunksize=chunksize, pool=pool),
+                                  rl_db.read_frame(query, pool=pool))
+
+
+def test_chunked_read_of_no_rows_keeps_the_columns(pool):
+    frame = rl_db.read_frame('Select * From Styles Where StyleId < %s', (0,), chunksize=4, pool=pool)
+    assert frame.empty
+    assert frame.columns.tolist() == ['StyleId', 'StyleCode', 'DiamondWt']
+
+
+def test_pool_reuses_idle_connections(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+
+
+def test_pool_discards_a_connection_that_failed(pool):
+    with pytest.raises(sqlite3.Error):
+        with pool.connection() as broken:
+            broken.execute('Select * From NoSuchTable')
+    with pool.connection() as conn:
+        assert conn is not broken
+    with pytest.raises(sqlite3.ProgrammingError):
+        broken.execute('Select 1')
+
+
+def test_sp_executesql_numbers_and_types_the_parameters():
+    driver = rl_db.Driver(lambda: None, server_side_params=True)
+    sql, params = driver.prepare("Select * From T Where Name Like %s And Id > %s And Code = 'A'", ('%Rel%', 5))
+    assert sql == ("EXEC sp_executesql N'Select * From T Where Name Like @p0 And Id > @p1 And Code = ''A''', "
+                   "N'@p0 nvarchar(4000), @p1 bigint', %s, %s")
+    assert params == ('%Rel%', 5)
+
+
+def test_set_driver_replaces_the_process_pool(tmp_path):
+    previous = rl_db._pool
+    try:
+        pool = rl_db.set_driver(rl_db.sqlite_driver(str(tmp_path / 'other.db')), size=1)
+        assert rl_db.get_pool() is pool
+        assert rl_db.read_frame('Select %s As Answer', (42,))['Answer'].tolist() == [42]
+    finally:
+        rl_db._pool.close()
+        rl_db._pool = previous
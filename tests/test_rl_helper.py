@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import rl_helper as H
+import run_reliance_local as R
+import rl_mapping as M
+from rl_mapping import last_two_digit_mapping, order_group_mapping, valid_product_categories
+
+
+# Reference implementations: the per-row loops the vectorized helpers replaced
+
+def _check_style_master_loop(df, client_style_master):
+    df['Checking_set'] = 0
+    for index, row in df[df['Article code'] != 'SET'].iterrows():
+        party_name = last_two_digit_mapping.get(row['Item Id'][-2:])
+        if party_name:
+            matches = client_style_master[
+                (client_style_master['Client Style No'] == row['Ext Item Id']) &
+                (client_style_master['PartyName'] == f"Reliance Retail Ltd {party_name}") &
+                (client_style_master['SubGroupPrdctCtg'].isin(valid_product_categories))
+            ]
+            if not matches.empty:
+                df.at[index, 'Checking_set'] = 1
+    return df
+
+
+def _validate_order_loop(actual_order_df, style_code_df):
+    actual_order_copy = actual_order_df.copy(deep=True)
+    actual_order_copy['Error'] = None
+    actual_order_copy['wrong_style_code'] = 0
+    for index, row in actual_order_copy.iterrows():
+        item_id = row['Ext Item Id']
+        if item_id in style_code_df['StyleCode'].values:
+            reference_row = style_code_df[style_code_df['StyleCode'] == item_id].iloc[0]
+            errors = []
+            tolerance = 0.03 * reference_row['DiamondWt']
+            if not (reference_row['DiamondWt'] - tolerance <= row['Dia Wt'] <= reference_row['DiamondWt'] + tolerance):
+                errors.append(f"Dia Wt doesn't match (±3% tolerance), This is the master diamond weight {reference_row['DiamondWt']}")
+            if row['Diamond Pieces'] != reference_row['DiamondPcs']:
+                errors.append(f"Diamond Pieces didn't match, This is the master diamond pieces {reference_row['DiamondPcs']}")
+            if row['withchain'] == 'BANGLE':
+                errors.append('PLEASE CHECK BANGLE SIZE')
+            if errors:
+                actual_order_copy.at[index, 'Error'] = ', '.join(errors)
+        else:
+            actual_order_copy.at[index, 'wrong_style_code'] = 1
+            actual_order_copy.at[index, 'Error'] = "Design number is wrong"
+    return actual_order_copy
+
+
+def _expected_remark(row):
+    """SpecialRemarks for one row, written out the way the old row-wise steps built it."""
+    is_set = ('SET' in str(row['Article code']).upper() or 'SET' in str(row['Sub Product Code']).upper()) \
+        and row['merged_set'] == 1
+    remark = f"MAINTAIN {'SET ' if is_set else ''}DIA.WT- {row['Dia Wt']} CTS, DIA TOL (+ - 3%)"
+    if row['Article code'] in ('ERG', 'NSO', 'NSP'):
+        remark = order_group_mapping.get(row['Item Id'][13:15], '') + ' ' + remark
+    if row['Article code'] == 'MSR':
+        remark += ' WITH CHAIN'
+    if row['Article code'] == 'PDC' or row['Sub Product Code'] in ('PDC', 'NECKLACE SET'):
+        remark += ' WITH CHAIN'
+    withchain = row['withchain'] if isinstance(row['withchain'], str) else ''
+    if 'NECKLACE' in withchain.upper() and 'WITH CHAIN' not in remark.upper():
+        remark += ' WITH CHAIN'
+    if 'BANGLE' in withchain.upper():
+        if row['Item Id'][13:15] == 'B1':
+            remark += ' QUANTITY FOR SINGLE BANGLE (MAKE SINGLE PCS)'
+        elif row['Item Id'][13:15] == 'B2':
+            remark += ' [QUANTITY FOR PAIR BANGLE, MAKE PAIR]'
+    return remark
+
+
+@pytest.fixture(scope='module')
+def style_master(fixture_book):
+    return R.load_style_master_csv(fixture_book['style_master'])
+
+
+@pytest.fixture(scope='module')
+def order_frames(fixture_book, style_master):
+    """(main, exploded SET) frames prepared the way the pipeline prepares them before the style checks."""
+    df = H.helper_reliance(R.read_mainorder_file(fixture_book['order_book']))
+    decoded = H.decode_item_id(df['Item Id'], df['Article code'])
+    df['CustomerProductionInstruction'] = decoded['CustomerProductionInstruction']
+    is_set = df['Article code'].astype(str).str.contains('SET', case=False) & \
+        df['Ext Item Id'].astype(str).str.contains(r'\+|&')
+    main = df[~is_set].copy()
+    main['merged_set'] = 0
+    # '+' splits into rows sharing the index label of the order line
+    set_rows = H.split_ext_item_id(df[is_set & df['Ext Item Id'].str.contains('+', regex=False)])
+    set_rows['merged_set'] = 1
+    assert not set_rows.index.is_unique
+    frames = []
+    for frame in (main, set_rows):
+        frame = H.stamping_instruct(frame)
+        frames.append(H.map_and_add_category_column(frame, style_master))
+    return frames
+
+
+def test_helper_reliance_totals_only_the_mapped_stones(fixture_book):
+    raw = R.read_mainorder_file(fixture_book['order_book'])
+    totals = H.helper_reliance(raw)
+    stone_columns = [column for columns in M.STONE_TOTAL_COLUMNS.values() for column in columns]
+    assert all(column in totals.columns for column in stone_columns)
+
+    # Same totals as a plain group-by of each mapped stone
+    raw = raw.iloc[:-4]
+    for stone, (weight_column, pieces_column) in M.STONE_TOTAL_COLUMNS.items():
+        expected = raw[raw['Item Id Stone'] == stone].groupby('WO Srl')[['Qty.1', 'Pds CW Qty']].sum()
+        got = totals.set_index('WO Srl')
+        np.testing.assert_allclose(got.loc[expected.index, weight_column], expected['Qty.1'].round(4))
+        np.testing.assert_array_equal(got.loc[expected.index, pieces_column], expected['Pds CW Qty'])
+        assert (got.loc[~got.index.isin(expected.index), [weight_column, pieces_column]] == 0).all().all()
+    assert 'CLR-STN' in set(raw['Item Id Stone']) - set(M.STONE_TOTAL_COLUMNS)
+
+
+def test_map_order_group_vectorized_matches_row_function(order_frames):
+    main, _ = order_frames
+    edge = pd.DataFrame({'Item Id': ['SHORT', '2ABCDEFGHIJ', np.nan], 'Article code': ['RNG', 'ERG', 'RNG']})
+    for frame in (main, edge):
+        expected = frame.apply(H.map_order_group, axis=1)
+        got = H.map_order_group_vectorized(frame)
+        assert got.tolist() == expected.tolist()
+
+
+def test_check_style_master_matches_loop(order_frames, style_master):
+    for frame in order_frames:
+        expected = _check_style_master_loop(frame.copy(), style_master)
+        got = H.check_style_master(frame.copy(), style_master)
+        pd.testing.assert_series_equal(got['Checking_set'], expected['Checking_set'])
+
+
+def test_check_style_master_matches_some_rows(order_frames, style_master):
+    main, _ = order_frames
+    assert H.check_style_master(main.copy(), style_master)['Checking_set'].any()
+
+
+def test_validate_order_matches_loop(order_frames, style_master):
+    for frame in order_frames:
+        expected = _validate_order_loop(frame, style_master)
+        got = H.validate_order(frame, style_master)
+        assert got['Error'].tolist() == expected['Error'].tolist()
+        assert got['wrong_style_code'].tolist() == expected['wrong_style_code'].tolist()
+
+
+def test_validate_order_reports_each_mismatch(style_master):
+    reference = style_master.iloc[0]
+    order = pd.DataFrame({
+        'Ext Item Id': [reference['StyleCode'], reference['StyleCode'], 'NO-SUCH-STYLE'],
+        'Dia Wt': [reference['DiamondWt'], reference['DiamondWt'] * 1.1, 1.0],
+        'Diamond Pieces': [reference['DiamondPcs'], reference['DiamondPcs'] + 1, 1],
+        'withchain': ['RING', 'BANGLE', None],
+    })
+    got = H.validate_order(order, style_master)
+    assert got['Error'].tolist() == [
+        None,
+        f"Dia Wt doesn't match (±3% tolerance), This is the master diamond weight {reference['DiamondWt']}, "
+        f"Diamond Pieces didn't match, This is the master diamond pieces {reference['DiamondPcs']}, "
+        "PLEASE CHECK BANGLE SIZE",
+        'Design number is wrong',
+    ]
+    assert got['wrong_style_code'].tolist() == [0, 0, 1]
+
+
+def test_process_special_remarks_matches_row_rules(order_frames):
+    for frame in order_frames:
+        got = H.process_special_remarks(frame.copy())
+        expected = [_expected_remark(row) for row in frame.to_dict('records')]
+        assert got['SpecialRemarks'].tolist() == expected
+
+
+def test_process_special_remarks_bangle_rows_with_shared_label():
+    # Rows 0 and 1 share a label, as exploded SET rows do
+    df = pd.DataFrame({
+        'Article code': ['BNG', 'BNG', 'BNG', 'RNG'],
+        'Sub Product Code': ['STD'] * 4,
+        'Dia Wt': [0.5, 0.5, 0.25, 0.1],
+        'Item Id': ['1' * 13 + 'B2' + '00', '1' * 13 + 'B2' + '00', '1' * 13 + 'B1' + '00', '1' * 17],
+        'merged_set': [0, 0, 0, 0],
+        'withchain': ['BANGLE', 'BANGLE', 'BANGLE', 'RING'],
+        'CustomerProductionInstruction': ['RHODIUM', 'RHODIUM', None, None],
+    }, index=[0, 0, 1, 2])
+    got = H.process_special_remarks(df)
+    assert got['SpecialRemarks'].tolist() == [
+        'MAINTAIN DIA.WT- 0.5 CTS, DIA TOL (+ - 3%) [QUANTITY FOR PAIR BANGLE, MAKE PAIR]',
+        'MAINTAIN DIA.WT- 0.5 CTS, DIA TOL (+ - 3%) [QUANTITY FOR PAIR BANGLE, MAKE PAIR]',
+        'MAINTAIN DIA.WT- 0.25 CTS, DIA TOL (+ - 3%) QUANTITY FOR SINGLE BANGLE (MAKE SINGLE PCS)',
+        'MAINTAIN DIA.WT- 0.1 CTS, DIA TOL (+ - 3%)',
+    ]
+    assert got['CustomerProductionInstruction'].tolist() == [
+        'RHODIUM NEED CERTIFICATE OF PAIR', 'RHODIUM NEED CERTIFICATE OF PAIR', None, None,
+    ]
@@ -0,0 +1,106 @@
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import rl_mapping as M
+from rl_columns import find_header_row, normalize_columns
+from rl_reader import (NA_VALUES, _settled_rows, apply_schema, iter_order_book_chunks, read_order_book)
+
+ENGINES = ['openpyxl', 'calamine']
+
+ORDER_HEADER = ['WO Srl', 'Item Id', 'Ext Item Id', 'Article code', 'Dia Wt', 'Diamond Pieces',
+                'Unused Note', 'Special Remarks']
+
+
+@pytest.fixture(scope='module')
+def messy_book(tmp_path_factory):
+    """
+    A summary sheet ahead of the order sheet, title rows above the header, an empty
+    row inside the data, a row filled only in a column that is not read, and every
+    NA token pandas knows in a text column.
+    """
+    wb = Workbook()
+    summary = wb.active
+    summary.title = 'Summary'
+    summary.append(['Report', 'Total'])
+    summary.append(['Orders', 12])
+
+    orders = wb.create_sheet('Orders')
+    orders.append(['Reliance order export'])
+    orders.append([])
+    orders.append(ORDER_HEADER)
+    tokens = sorted(NA_VALUES - {''}) + ['NONE', 'n.a', 'Keep']
+    for i, token in enumerate(tokens):
+        orders.append([i // 3, f'1{i:016d}', f'W-LRB{i:05d}', 'RNG', 0.25 + i / 100, i, None, token])
+        if i == 5:
+            orders.append([])
+            orders.append([None] * 6 + ['note only'])
+    path = tmp_path_factory.mktemp('messy') / 'orders.xlsx'
+    wb.save(path)
+    return str(path)
+
+
+def _pandas_read(path, engine):
+    # The read_excel path read_order_book replaced: probe for the header, then read below it
+    head = pd.read_excel(path, sheet_name='Orders', header=None, dtype=str, engine=engine, nrows=25)
+    hdr_idx = find_header_row(head)
+    df = pd.read_excel(path, sheet_name='Orders', header=hdr_idx, dtype=str, engine=engine)
+    return normalize_columns(df).dropna(how='all').reset_index(drop=True)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_full_read_matches_read_excel(messy_book, engine):
+    df = read_order_book(messy_book, find_header_row, normalize_columns, engine=engine)
+    pd.testing.assert_frame_equal(df, _pandas_read(messy_book, engine))
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_projected_read_matches_full_read(messy_book, engine):
+    full = read_order_book(messy_book, find_header_row, normalize_columns, engine=engine)
+    projected = read_order_book(messy_book, find_header_row, normalize_columns, engine=engine,
+                                columns=M.RELIANCE_INPUT_COLUMNS)
+    kept = [column for column in full.columns if column in M.RELIANCE_INPUT_COLUMNS]
+    assert 'Unused Note' not in projected.columns
+    pd.testing.assert_frame_equal(projected, full[kept])
+
+    # The NA tokens are NaN and everything else is kept as text
+    remarks = projected['Special Remarks'].dropna().tolist()
+    assert remarks == ['NONE', 'n.a', 'Keep']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_projected_read_of_the_fixture_book(fixture_book, engine):
+    path = fixture_book['order_book']
+    full = read_order_book(path, find_header_row, normalize_columns, engine=engine)
+    projected = read_order_book(path, find_header_row, normalize_columns, engine=engine,
+                                columns=M.RELIANCE_INPUT_COLUMNS, schema=M.RELIANCE_INPUT_SCHEMA)
+    kept = [column for column in full.columns if column in M.RELIANCE_INPUT_COLUMNS]
+    pd.testing.assert_frame_equal(projected, apply_schema(full[kept].copy(), M.RELIANCE_INPUT_SCHEMA))
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('chunk_rows', [1, 7, 64, 10000])
+def test_chunks_concatenate_to_the_whole_sheet(fixture_book, engine, chunk_rows):
+    path = fixture_book['order_book']
+    chunks = list(iter_order_book_chunks(path, chunk_rows, align_column='WO Srl', footer_rows=4,
+                                         engine=engine, schema=M.RELIANCE_INPUT_SCHEMA))
+    expected = apply_schema(pd.read_excel(path, sheet_name=0, dtype=str), M.RELIANCE_INPUT_SCHEMA).iloc[:-4]
+    got = pd.concat(chunks)
+    for column, dtype in M.RELIANCE_INPUT_SCHEMA.items():
+        if dtype == 'category':
+            got[column] = got[column].astype(object).astype('category')
+    pd.testing.assert_frame_equal(got, expected, check_categorical=False)
+
+    # A WO Srl never spans two chunks
+    owners = pd.concat([chunk['WO Srl'].drop_duplicates() for chunk in chunks])
+    assert not owners.duplicated().any()
+
+
+@pytest.mark.parametrize('blank', [[], ['', '', ''], [None, '', None]])
+def test_settled_rows_hold_back_the_footer_and_trailing_blanks(blank):
+    # openpyxl trims empty rows to []; calamine keeps them as wide as the sheet
+    rows = [['a', 1, 'x'], list(blank), ['b', 2, 'y'], ['total', 3, ''], list(blank), list(blank)]
+    assert list(_settled_rows(iter(rows), footer_rows=0)) == rows[:4]
+    assert list(_settled_rows(iter(rows), footer_rows=1)) == rows[:3]
+    assert list(_settled_rows(iter(rows), footer_rows=2)) == rows[:2]
+    assert list(_settled_rows(iter(rows), footer_rows=4)) == []
@@ -0,0 +1,175 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import rl_db
+import rl_style_cache as C
+
+CLIENT = 'Reliance'
+
+STYLES = [
+    # StyleId, SKUNo, MainGroupPrdctCtg, SubGroupPrdctCtg, StyleCode, StyleDate, LegalName, PartyName, DiamondPcs, DiamondWt
+    (101, 'SKU-101', 'RING', 'LDS', 'W-LRB00001', '2026-01-05 10:00:00.000', 'Reliance Retail Ltd', 'Reliance Retail Ltd TBZ', 12, 0.25),
+    (102, 'SKU-102', 'EARRING', 'STD', 'W-LRB00002', '2026-01-06 10:00:00.000', 'Reliance Retail Ltd', 'Reliance Retail Ltd TBZ', 8, 0.1),
+    (103, 'SKU-103', 'BANGLE', 'GNT', 'W-LRB00003', '2026-01-07 10:00:00.000', 'Reliance Retail Ltd', 'Reliance Retail Ltd TBZ', 30, 1.05),
+    (201, 'SKU-201', 'RING', 'LDS', 'T-00001', '2026-01-05 10:00:00.000', 'Titan Company Ltd', 'Titan Company Ltd', 4, 0.05),
+]
+VALIDATOR = [('RRL-1', 'W-LRB00001'), ('RRL-2', 'W-LRB00002')]
+
+STYLE_QUERY = """Select StyleId, SKUNo, MainGroupPrdctCtg, SubGroupPrdctCtg, StyleCode, StyleDate,
+                 LegalName, PartyName, DiamondPcs, DiamondWt
+                 From StyleMst Where LegalName Like %s {extra_filter}
+                 Order By LegalName, SubGroupPrdctCtg, SKUNo"""
+
+
+class SqliteStyleSource:
+    """Stand-ins for the reliance_sql_function fetchers, querying a SQLite copy through rl_db."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.calls = {'full': 0, 'delta': 0, 'ids': 0}
+
+    def fetch_client_data(self, client_name):
+        self.calls['full'] += 1
+        style_master = rl_db.read_frame(STYLE_QUERY.format(extra_filter=''), (f'%{client_name}%',), pool=self.pool)
+        validator = rl_db.read_frame('Select * From RRLDsgCdMst Order By RRLDsgCd, AuraDsgCd', pool=self.pool)
+        return style_master, validator
+
+    def fetch_style_master_delta(self, client_name, since_date=None, since_id=None):
+        self.calls['delta'] += 1
+        query = STYLE_QUERY.format(extra_filter='And (StyleDate > %s Or StyleId > %s)')
+        return rl_db.read_frame(query, (f'%{client_name}%', since_date, since_id), pool=self.pool)
+
+    def fetch_style_ids(self, client_name):
+        self.calls['ids'] += 1
+        query = 'Select StyleId From StyleMst Where LegalName Like %s'
+        return rl_db.read_frame(query, (f'%{client_name}%',), pool=self.pool)['StyleId']
+
+    def execute(self, statement, params=()):
+        with self.pool.connection() as conn:
+            conn.execute(statement, params)
+            conn.commit()
+
+
+@pytest.fixture
+def source(tmp_path):
+    pool = rl_db.ConnectionPool(rl_db.sqlite_driver(str(tmp_path / 'aura.db')), size=2)
+    with pool.connection() as conn:
+        conn.execute("""Create Table StyleMst (StyleId Integer, SKUNo Text, MainGroupPrdctCtg Text,
+                        SubGroupPrdctCtg Text, StyleCode Text, StyleDate Text, LegalName Text,
+                        PartyName Text, DiamondPcs Integer, DiamondWt Real)""")
+        conn.executemany('Insert Into StyleMst Values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', STYLES)
+        conn.execute('Create Table RRLDsgCdMst (RRLDsgCd Text, AuraDsgCd Text)')
+        conn.executemany('Insert Into RRLDsgCdMst Values (?, ?)', VALIDATOR)
+        conn.commit()
+    yield SqliteStyleSource(pool)
+    pool.close()
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / 'style_cache')
+
+
+def _age_snapshot(cache_dir, seconds):
+    """Move the snapshot's fetch time `seconds` into the past."""
+    meta_path = os.path.join(C._client_dir(CLIENT, cache_dir), C.META_FILE)
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    meta['fetched_at'] -= seconds
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return meta
+
+
+def _assert_frames_equal(got, expected):
+    assert len(got) == len(expected)
+    for got_frame, expected_frame in zip(got, expected):
+        pd.testing.assert_frame_equal(got_frame.reset_index(drop=True), expected_frame.reset_index(drop=True))
+
+
+def test_snapshot_matches_live_fetch(source, cache_dir):
+    first = C.fetch_client_data_cached(CLIENT, cache_dir=cache_dir, fetcher=source.fetch_client_data,
+                                       incremental=False)
+    cached = C.fetch_client_data_cached(CLIENT, cache_dir=cache_dir, fetcher=source.fetch_client_data,
+                                        incremental=False)
+    assert source.calls['full'] == 1
+    _assert_frames_equal(first, source.fetch_client_data(CLIENT))
+    _assert_frames_equal(cached, source.fetch_client_data(CLIENT))
+    assert C.read_meta(CLIENT, cache_dir)['rows'] == [3, 2]
+
+
+def test_expired_snapshot_is_fetched_again(source, cache_dir):
+    C.fetch_client_data_cached(CLIENT, ttl=60, cache_dir=cache_dir, fetcher=source.fetch_client_data,
+                               incremental=False)
+    _age_snapshot(cache_dir, 120)
+    C.fetch_client_data_cached(CLIENT, ttl=60, cache_dir=cache_dir, fetcher=source.fetch_client_data,
+                               incremental=False)
+    assert source.calls['full'] == 2
+
+
+def test_force_refresh_skips_the_snapshot(source, cache_dir):
+    C.fetch_client_data_cached(CLIENT, cache_dir=cache_dir, fetcher=source.fetch_client_data, incremental=False)
+    source.execute("Update StyleMst Set DiamondPcs = 14 Where StyleId = 101")
+    refreshed = C.fetch_client_data_cached(CLIENT, force_refresh=True, cache_dir=cache_dir,
+                                           fetcher=source.fetch_client_data, incremental=False)
+    _assert_frames_equal(refreshed, source.fetch_client_data(CLIENT))
+    _assert_frames_equal(C.read_snapshot(CLIENT, cache_dir=cache_dir), refreshed)
+
+
+def test_empty_fetch_is_not_cached(cache_dir):
+    frames = C.fetch_client_data_cached(CLIENT, cache_dir=cache_dir, incremental=False,
+                                        fetcher=lambda client_name: (pd.DataFrame(), pd.DataFrame()))
+    assert frames[0].empty
+    assert C.read_meta(CLIENT, cache_dir) is None
+
+
+def _fetch_incremental(source, cache_dir, **kwargs):
+    return C.fetch_client_data_cached(CLIENT, cache_dir=cache_dir, fetcher=source.fetch_client_data,
+                                      incremental=True, delta_fetcher=source.fetch_style_master_delta,
+                                      ids_fetcher=source.fetch_style_ids, **kwargs)
+
+
+def test_delta_sync_matches_live_fetch(source, cache_dir):
+    _fetch_incremental(source, cache_dir)
+    fetched_at = C.read_meta(CLIENT, cache_dir)['fetched_at']
+    source.execute("Insert Into StyleMst Values (104, 'SKU-104', 'NECKLACE', 'LDS', 'W-LRB00004', "
+                   "'2026-02-01 09:30:00.000', 'Reliance Retail Ltd', 'Reliance Retail Ltd TBZ', 40, 1.2)")
+
+    synced = _fetch_incremental(source, cache_dir)
+    # The first call had no snapshot to sync, so only the second pulled a delta
+    assert source.calls == {'full': 1, 'delta': 1, 'ids': 0}
+    _assert_frames_equal(synced, source.fetch_client_data(CLIENT))
+
+    # The TTL keeps counting from the full fetch; the delta only moves synced_at
+    meta = C.read_meta(CLIENT, cache_dir)
+    assert meta['fetched_at'] == fetched_at
+    assert meta['synced_at'] > fetched_at
+    assert meta['watermark'] == {'StyleDate': '2026-02-01 09:30:00.000', 'StyleId': 104}
+
+
+def test_reconcile_drops_deleted_styles(source, cache_dir):
+    _fetch_incremental(source, cache_dir)
+    source.execute('Delete From StyleMst Where StyleId = 102')
+    # A delta cannot see deletions; they wait for the next reconciliation
+    synced = _fetch_incremental(source, cache_dir)
+    assert 102 in synced[0]['StyleId'].values
+
+    synced = C.sync_client_data(CLIENT, reconcile_every=0, cache_dir=cache_dir,
+                                delta_fetcher=source.fetch_style_master_delta, ids_fetcher=source.fetch_style_ids)
+    assert source.calls['ids'] == 1
+    _assert_frames_equal(synced, source.fetch_client_data(CLIENT))
+
+
+def test_incremental_mode_fetches_in_full_after_the_ttl(source, cache_dir):
+    _fetch_incremental(source, cache_dir, ttl=60)
+    source.execute("Update RRLDsgCdMst Set AuraDsgCd = 'W-LRB00003' Where RRLDsgCd = 'RRL-2'")
+    _age_snapshot(cache_dir, 120)
+
+    frames = _fetch_incremental(source, cache_dir, ttl=60)
+    # The expired snapshot is not delta-synced at all
+    assert source.calls == {'full': 2, 'delta': 0, 'ids': 0}
+    # The validator frame only changes with a full fetch
+    _assert_frames_equal(frames, source.fetch_client_data(CLIENT))
@@ -0,0 +1,101 @@
+import logging
+
+import pandas as pd
+import pytest
+
+import rl_excelconverter as XL
+import run_reliance_local as R
+
+CHUNK_SIZES = [1, 7, 64, 10000]
+
+# Columns the workbook does not show (Dia Wt, Diamond Pieces) but that carry the stone totals
+COMPARED = ['WO Srl', 'StyleCode', 'OrderGroup', 'Dia Wt', 'Diamond Pieces', 'Metal', 'Tone', 'Checking_set',
+            'withchain', 'SpecialRemarks', 'StampInstruction', 'Error', 'wrong_style_code']
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    """Collect the frames each run hands to the exporter, by branch ('main' / 'set')."""
+    frames = {'main': [], 'set': []}
+    process_and_export, spool_add = XL.process_and_export, XL.SheetSpool.add
+
+    def collect(df, set_processed):
+        frames['main'].append(df.copy())
+        if set_processed is not None:
+            frames['set'].append(set_processed.copy())
+
+    def export(df, *args, **kwargs):
+        collect(df, kwargs.get('set_processed'))
+        return process_and_export(df, *args, **kwargs)
+
+    def add(self, df, set_processed=None):
+        collect(df, set_processed)
+        return spool_add(self, df, set_processed)
+
+    monkeypatch.setattr(XL, 'process_and_export', export)
+    monkeypatch.setattr(XL.SheetSpool, 'add', add)
+
+    def take():
+        taken = {branch: _comparable(parts) for branch, parts in frames.items()}
+        frames['main'], frames['set'] = [], []
+        return taken
+    return take
+
+
+def _comparable(parts):
+    if not parts:
+        return None
+    df = pd.concat(parts)
+    columns = [column for column in COMPARED if column in df.columns]
+    df = df[columns].astype(object).where(df[columns].notna(), None).astype(str)
+    return df.sort_values(['WO Srl', 'StyleCode'], kind='stable').reset_index(drop=True)
+
+
+def _run_both(book, tmp_path, chunk_rows, exported):
+    kwargs = dict(style_master_csv=book['style_master'], validator_csv=book['validator'])
+    whole_file = R.run_offline(book['order_book'], 'Reliance', str(tmp_path / 'whole'), output_format='xlsx',
+                               **kwargs)
+    whole = exported()
+    streamed_file = R.run_offline_streaming(book['order_book'], 'Reliance', str(tmp_path / 'streamed'),
+                                            chunk_rows=chunk_rows, **kwargs)
+    streamed = exported()
+    return (whole_file, whole), (streamed_file, streamed)
+
+
+def _assert_same_workbook(got_file, expected_file):
+    got = pd.read_excel(got_file, sheet_name=None, dtype=str)
+    expected = pd.read_excel(expected_file, sheet_name=None, dtype=str)
+    assert list(got) == list(expected)
+    for sheet in expected:
+        pd.testing.assert_frame_equal(got[sheet], expected[sheet], obj=sheet)
+
+
+def _assert_same_frames(got, expected):
+    for branch in ('main', 'set'):
+        if expected[branch] is None:
+            assert got[branch] is None
+        else:
+            pd.testing.assert_frame_equal(got[branch], expected[branch], obj=branch)
+
+
+@pytest.mark.parametrize('chunk_rows', CHUNK_SIZES)
+def test_streaming_matches_whole_book(fixture_book, tmp_path, chunk_rows, exported):
+    (whole_file, whole), (streamed_file, streamed) = _run_both(fixture_book, tmp_path, chunk_rows, exported)
+    assert whole['set'] is not None
+    _assert_same_frames(streamed, whole)
+    _assert_same_workbook(streamed_file, whole_file)
+
+
+@pytest.mark.parametrize('chunk_rows', CHUNK_SIZES)
+def test_unsorted_book_falls_back_to_whole_book(unsorted_book, tmp_path, chunk_rows, exported, caplog):
+    with caplog.at_level(logging.WARNING, logger=R.logger.name):
+        (whole_file, whole), (streamed_file, streamed) = _run_both(unsorted_book, tmp_path, chunk_rows, exported)
+    assert 'not contiguous' in caplog.text
+    _assert_same_frames(streamed, whole)
+    _assert_same_workbook(streamed_file, whole_file)
+
+
+def test_scan_book_finds_scattered_wo_srl(fixture_book, unsorted_book):
+    for chunk_rows in CHUNK_SIZES:
+        assert R._scan_book(fixture_book['order_book'], chunk_rows)[1]
+        assert not R._scan_book(unsorted_book['order_book'], chunk_rows)[1]